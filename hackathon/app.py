@@ -1,77 +1,70 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, make_response, render_template, jsonify, request
 from flask_cors import CORS
-import requests
 import random
+import atexit
 import base64
+import csv
 import io
 from PIL import Image
 import numpy as np
 from datetime import datetime
-import hashlib
 import json
-from time import time
+import math
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import wraps
+from time import sleep
+from blockchain import Blockchain
+from bulk_ingest import rows_from_csv, validate_rows
+from cache import TTLCache
+from chat import ChatIndex
+from crop_engine import CropTable
+from http_client import HTTPClient
+from intercrop import CompanionGraph
+from market import MarketPrices
+from mining import Miner
+from prefetch import ForecastPrefetcher
+from result_cache import DiskCache, content_key
+from singleflight import SingleFlight
+from snapshots import SnapshotSet
+import soil_image
+from soil_tiles import SoilTiles, soilgrids_ph, soilgrids_url
+from uploads import SpooledRequest, file_digest, peak_memory
+from validation import validate_chain
 
 app = Flask(__name__)
 CORS(app)
 
+# Bodies over MAX_CONTENT_LENGTH are refused with 413 before they are read;
+# uploaded files spill from memory to a temp file past UPLOAD_SPOOL_BYTES
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
+SpooledRequest.SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', 256 * 1024))
+app.request_class = SpooledRequest
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'success': False, 'error': 'Upload too large'}), 413
+
 # ============================================
-# BLOCKCHAIN CLASS (Integrated directly)
+# BLOCKCHAIN (shared with blockchain.py)
 # ============================================
 
-class Blockchain:
-    def __init__(self):
-        self.chain = []
-        self.current_transactions = []
-        # Create genesis block
-        self.new_block(previous_hash='1', proof=100)
-    
-    def new_block(self, proof, previous_hash=None):
-        """Create a new block in the blockchain"""
-        block = {
-            'index': len(self.chain) + 1,
-            'timestamp': time(),
-            'transactions': self.current_transactions,
-            'proof': proof,
-            'previous_hash': previous_hash or self.hash(self.chain[-1]) if self.chain else '1',
-        }
-        # Reset current transactions
-        self.current_transactions = []
-        self.chain.append(block)
-        return block
-    
-    def new_transaction(self, farmer, crop, price, quantity, location):
-        """Add a new transaction to the current block"""
-        transaction = {
-            'farmer': farmer,
-            'crop': crop,
-            'price': float(price),
-            'quantity': float(quantity),
-            'location': location,
-            'timestamp': time()
-        }
-        self.current_transactions.append(transaction)
-        return self.last_block['index'] + 1
-    
-    @staticmethod
-    def hash(block):
-        """Create a SHA-256 hash of a block"""
-        block_string = json.dumps(block, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
-    
-    @property
-    def last_block(self):
-        """Return the last block in the chain"""
-        return self.chain[-1]
-    
-    def get_all_transactions(self):
-        """Get all transactions from all blocks"""
-        all_transactions = []
-        for block in self.chain:
-            all_transactions.extend(block['transactions'])
-        return all_transactions
+MINING_DIFFICULTY = int(os.environ.get('MINING_DIFFICULTY', 4))
 
-# Initialize blockchain
-blockchain = Blockchain()
+# The ledger persists in SQLite; all workers share the same file
+LEDGER_PATH = os.environ.get('LEDGER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ledger.db'))
+
+# Initialize blockchain; proof-of-work is split across MINING_WORKERS processes
+blockchain = Blockchain(
+    difficulty=MINING_DIFFICULTY,
+    miner=Miner(MINING_DIFFICULTY, workers=int(os.environ.get('MINING_WORKERS', 0)) or None),
+    path=LEDGER_PATH,
+    # Seconds between mempool flushes; unset = commit before each write returns
+    flush_interval=float(os.environ.get('MEMPOOL_FLUSH_INTERVAL', 0)) or None
+)
+atexit.register(blockchain.flush)
 
 # ============================================
 # CROP DATABASE (Based on Scientific Data)
@@ -168,42 +161,162 @@ CROP_DATABASE = {
     }
 }
 
+# Columnar view of the catalogue used by the scoring engine
+crop_table = CropTable(CROP_DATABASE)
+
+# Companion / bad-companion relations as bitsets, for intercropping plans
+companion_graph = CompanionGraph(CROP_DATABASE)
+
+# Chat intents in every language, matched in one pass per message
+chat_index = ChatIndex(CROP_DATABASE)
+
+# ============================================
+# UPSTREAM HTTP CLIENT (pooled, keep-alive)
+# ============================================
+
+upstream = HTTPClient(
+    connect_timeout=float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3.05)),
+    read_timeout=float(os.environ.get('UPSTREAM_READ_TIMEOUT', 5)),
+    retries=int(os.environ.get('UPSTREAM_RETRIES', 2)),
+    pool_size=int(os.environ.get('UPSTREAM_POOL_SIZE', 20))
+)
+
+# Seconds a request waits on an upstream fetch, retries included, before it
+# falls back: the weather/soil routes and /api/recommend-crops respectively
+UPSTREAM_DEADLINE = float(os.environ.get('UPSTREAM_DEADLINE', 5))
+RECOMMEND_DEADLINE = float(os.environ.get('RECOMMEND_DEADLINE', 3))
+
+# ============================================
+# FORECAST CACHE (shared by weather routes)
+# ============================================
+
+# Forecasts are cached per grid cell: nearby farms share one upstream fetch.
+FORECAST_GRID = float(os.environ.get('FORECAST_GRID', '0.1'))
+
+forecast_cache = TTLCache(
+    ttl=int(os.environ.get('FORECAST_CACHE_TTL', 900)),
+    max_entries=int(os.environ.get('FORECAST_CACHE_ENTRIES', 2048)),
+    max_bytes=int(os.environ.get('FORECAST_CACHE_BYTES', 32 * 1024 * 1024))
+)
+
+def grid_cell(lat, lon):
+    """Snap coordinates to the centre of their forecast grid cell"""
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('lat must be within [-90, 90] and lon within [-180, 180]')
+    lat = round(round(lat / FORECAST_GRID) * FORECAST_GRID, 4)
+    lon = round(round(lon / FORECAST_GRID) * FORECAST_GRID, 4)
+    return lat, lon
+
+# Concurrent misses for the same key wait on one upstream fetch.
+forecast_flight = SingleFlight()
+soil_flight = SingleFlight()
+
+def forecast_url(cells):
+    """Open-Meteo query for one or more grid cells (comma-separated coordinates)"""
+    lats = ','.join(str(cell[0]) for cell in cells)
+    lons = ','.join(str(cell[1]) for cell in cells)
+    return f"https://api.open-meteo.com/v1/forecast?latitude={lats}&longitude={lons}&current_weather=true&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weathercode&timezone=auto&forecast_days=7"
+
+def _download_forecast(cell, deadline=None):
+    response = upstream.get(forecast_url([cell]), deadline=deadline)
+    data = response.json()
+    forecast_cache.set(cell, data, size=len(response.content))
+    return data
+
+def _download_forecasts(cells):
+    """Fetch and cache several cells in one request; Open-Meteo answers a list, in order"""
+    response = upstream.get(forecast_url(cells))
+    data = response.json()
+    if isinstance(data, dict):
+        data = [data]
+    if len(data) != len(cells):
+        raise ValueError(f'Expected {len(cells)} forecasts, got {len(data)}')
+    size = len(response.content) // len(cells)
+    for cell, forecast in zip(cells, data):
+        forecast_cache.set(cell, forecast, size=size)
+    return data
+
+# Cells that were asked for recently are re-fetched in the background shortly
+# before they expire, so repeat visitors read the cache. PREFETCH_INTERVAL=0 disables.
+forecast_prefetcher = ForecastPrefetcher(
+    _download_forecasts, forecast_cache,
+    interval=float(os.environ.get('PREFETCH_INTERVAL', 60)),
+    lead=float(os.environ.get('PREFETCH_LEAD', 180)),
+    idle_after=float(os.environ.get('PREFETCH_IDLE', 26 * 3600)),
+    batch_size=int(os.environ.get('PREFETCH_BATCH', 50)),
+    concurrency=int(os.environ.get('PREFETCH_CONCURRENCY', 2)),
+    # Open-Meteo answers 400 when any coordinate in the query is invalid
+    rejected=lambda error: getattr(getattr(error, 'response', None), 'status_code', None) == 400
+)
+if forecast_prefetcher.interval > 0:
+    forecast_prefetcher.start(app.logger.warning)
+
+def fetch_forecast(lat, lon, deadline=None):
+    """Return the 7-day forecast (daily + current_weather) for a grid cell.
+
+    With a deadline (seconds) a miss gives up, retries included, once it passes.
+    """
+    cell = grid_cell(lat, lon)
+    data = forecast_cache.get(cell)
+    if data is None:
+        data = forecast_flight.do(cell, lambda: _download_forecast(cell, deadline))
+    forecast_prefetcher.touch(cell)
+    return data
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters for the forecast, image result and soil tile caches"""
+    return jsonify({
+        'success': True,
+        'forecast': forecast_cache.stats(),
+        'prefetch': forecast_prefetcher.stats(),
+        'coalescing': {
+            'forecast': forecast_flight.stats(),
+            'soil': soil_flight.stats()
+        },
+        'upstream': upstream.stats(),
+        'image_results': image_results.stats(),
+        'soil_tiles': soil_tiles.stats(),
+        'snapshots': {'intercropping': intercropping_snapshots.stats()}
+    })
+
 # ============================================
 # REAL API: WEATHER (Open-Meteo - No Key)
 # ============================================
 
+def weather_report(data):
+    """Summarise a forecast into the /api/weather payload"""
+    avg_temp = sum(data['daily']['temperature_2m_max'][:3]) / 3
+    total_rain = sum(data['daily']['precipitation_sum'][:3])
+
+    if total_rain > 50:
+        advice = "⚠️ HEAVY RAIN ALERT! Ensure drainage systems ready."
+    elif total_rain > 20:
+        advice = "🌧️ Rain expected. Delay sowing if possible."
+    elif avg_temp > 35:
+        advice = "🌡️ Heat wave conditions. Increase irrigation."
+    else:
+        advice = "✅ Favorable weather for farming activities."
+
+    return {
+        'success': True,
+        'current_temp': data['current_weather']['temperature'],
+        'current_wind': data['current_weather']['windspeed'],
+        'forecast': data['daily'],
+        'avg_temp': round(avg_temp, 1),
+        'total_rain': round(total_rain, 1),
+        'advice': advice,
+        'source': 'Open-Meteo'
+    }
+
 @app.route('/api/weather')
 def get_weather():
     lat = request.args.get('lat', '10.7905')
     lon = request.args.get('lon', '78.7045')
-    
+
     try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weathercode&timezone=auto&forecast_days=7"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        
-        avg_temp = sum(data['daily']['temperature_2m_max'][:3]) / 3
-        total_rain = sum(data['daily']['pr-ecipitation_sum'][:3])
-        
-        if total_rain > 50:
-            advice = "⚠️ HEAVY RAIN ALERT! Ensure drainage systems ready."
-        elif total_rain > 20:
-            advice = "🌧️ Rain expected. Delay sowing if possible."
-        elif avg_temp > 35:
-            advice = "🌡️ Heat wave conditions. Increase irrigation."
-        else:
-            advice = "✅ Favorable weather for farming activities."
-            
-        return jsonify({
-            'success': True,
-            'current_temp': data['current_weather']['temperature'],
-            'current_wind': data['current_weather']['windspeed'],
-            'forecast': data['daily'],
-            'avg_temp': round(avg_temp, 1),
-            'total_rain': round(total_rain, 1),
-            'advice': advice,
-            'source': 'Open-Meteo'
-        })
+        return jsonify(weather_report(fetch_forecast(lat, lon, UPSTREAM_DEADLINE)))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -211,182 +324,202 @@ def get_weather():
 # RAIN ALERT SYSTEM
 # ============================================
 
+RAIN_ALERT_UNAVAILABLE = {'alert': 'GREEN', 'message': 'Weather data unavailable'}
+
+def rain_alert_report(data):
+    """Classify the next three days of rain into a RED/YELLOW/GREEN alert"""
+    rain_total = sum(data['daily']['precipitation_sum'][:3])
+
+    if rain_total > 50:
+        return {
+            'alert': 'RED',
+            'message': '⚠️ HEAVY RAIN ALERT! Ensure drainage systems ready.',
+            'rain': rain_total
+        }
+    elif rain_total > 20:
+        return {
+            'alert': 'YELLOW',
+            'message': '🌧️ Rain expected. Delay sowing if possible.',
+            'rain': rain_total
+        }
+    else:
+        return {
+            'alert': 'GREEN',
+            'message': '✅ No heavy rain. Good for farming.',
+            'rain': rain_total
+        }
+
 @app.route('/api/rain-alert')
 def rain_alert():
     lat = request.args.get('lat', '10.7905')
     lon = request.args.get('lon', '78.7045')
-    
+
     try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=precipitation_sum&forecast_days=3"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        
-        rain_total = sum(data['daily']['precipitation_sum'])
-        
-        if rain_total > 50:
-            return jsonify({
-                'alert': 'RED',
-                'message': '⚠️ HEAVY RAIN ALERT! Ensure drainage systems ready.',
-                'rain': rain_total
-            })
-        elif rain_total > 20:
-            return jsonify({
-                'alert': 'YELLOW',
-                'message': '🌧️ Rain expected. Delay sowing if possible.',
-                'rain': rain_total
-            })
-        else:
-            return jsonify({
-                'alert': 'GREEN',
-                'message': '✅ No heavy rain. Good for farming.',
-                'rain': rain_total
-            })
+        return jsonify(rain_alert_report(fetch_forecast(lat, lon, UPSTREAM_DEADLINE)))
     except:
-        return jsonify({'alert': 'GREEN', 'message': 'Weather data unavailable'})
+        return jsonify(RAIN_ALERT_UNAVAILABLE)
 
 # ============================================
 # REAL API: SOIL (SoilGrids)
 # ============================================
 
+SOIL_FALLBACK = {
+    'success': True,
+    'ph': 6.5,
+    'classification': 'Neutral',
+    'recommendation': 'Ideal for most crops',
+    'source': 'Approximate'
+}
+
+# Soil pH is served from a memory-mapped grid (see soil_tiles.py); SoilGrids is
+# only queried for cells not known yet, and each answer fills its cell.
+soil_tiles = SoilTiles(
+    os.environ.get('SOIL_TILES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'soil_ph.npy')),
+    resolution=float(os.environ.get('SOIL_TILES_RESOLUTION', 0.05))
+)
+SOIL_TILE_LOOKUP = os.environ.get('SOIL_TILE_LOOKUP', 'nearest')  # or 'bilinear'
+atexit.register(soil_tiles.flush)
+
+def _download_soil_ph(lat, lon, deadline=None):
+    ph = soilgrids_ph(upstream.get_json(soilgrids_url(lat, lon), deadline=deadline))
+    soil_tiles.fill(lat, lon, ph)
+    return ph
+
+def fetch_soil_ph(lat, lon, deadline=None):
+    """Return topsoil pH from the tile store, else SoilGrids (coalescing identical in-flight queries)"""
+    lat, lon = round(float(lat), 4), round(float(lon), 4)
+    ph = soil_tiles.lookup(lat, lon, SOIL_TILE_LOOKUP)
+    if ph is not None:
+        return ph
+    # One query per cell: concurrent misses anywhere in it share the fetch
+    cell = soil_tiles.cell(lat, lon)
+    if cell is not None:
+        lat, lon = soil_tiles.cell_center(cell)
+    return soil_flight.do((lat, lon), lambda: _download_soil_ph(lat, lon, deadline))
+
+def soil_report(ph_value):
+    """Classify a pH reading into the /api/soil payload"""
+    ph = round(ph_value, 1)
+
+    if ph < 5.5:
+        classification = "Strongly Acidic"
+        recommendation = "Add lime to increase pH"
+    elif ph < 6.5:
+        classification = "Slightly Acidic"
+        recommendation = "Ideal for most crops"
+    elif ph < 7.3:
+        classification = "Neutral"
+        recommendation = "Perfect for farming"
+    else:
+        classification = "Alkaline"
+        recommendation = "Add organic matter to lower pH"
+
+    return {
+        'success': True,
+        'ph': ph,
+        'classification': classification,
+        'recommendation': recommendation,
+        'source': 'SoilGrids.org'
+    }
+
+def soil_lookup(lat, lon):
+    """Return the soil payload for a location, or the approximate fallback"""
+    try:
+        return soil_report(fetch_soil_ph(lat, lon, UPSTREAM_DEADLINE))
+    except:
+        return SOIL_FALLBACK
+
 @app.route('/api/soil')
 def get_soil():
     lat = request.args.get('lat', '10.7905')
     lon = request.args.get('lon', '78.7045')
-    
-    try:
-        url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lon={lon}&lat={lat}&property=phh2o&depth=0-5cm&value=mean"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        
-        ph_value = data['properties'][0]['depths'][0]['values']['mean'] / 10
-        ph = round(ph_value, 1)
-        
-        if ph < 5.5:
-            classification = "Strongly Acidic"
-            recommendation = "Add lime to increase pH"
-        elif ph < 6.5:
-            classification = "Slightly Acidic"
-            recommendation = "Ideal for most crops"
-        elif ph < 7.3:
-            classification = "Neutral"
-            recommendation = "Perfect for farming"
-        else:
-            classification = "Alkaline"
-            recommendation = "Add organic matter to lower pH"
-            
-        return jsonify({
-            'success': True,
-            'ph': ph,
-            'classification': classification,
-            'recommendation': recommendation,
-            'source': 'SoilGrids.org'
-        })
-    except:
-        return jsonify({
-            'success': True,
-            'ph': 6.5,
-            'classification': 'Neutral',
-            'recommendation': 'Ideal for most crops',
-            'source': 'Approximate'
-        })
+    return jsonify(soil_lookup(lat, lon))
 
 # ============================================
 # REAL API: MARKET PRICES
 # ============================================
 
+# Daily mandi prices (date,crop,price CSV); crops without history use flat base prices
+MARKET_PRICES_CSV = os.environ.get('MARKET_PRICES_CSV')
+market_prices = MarketPrices.from_csv(MARKET_PRICES_CSV) if MARKET_PRICES_CSV else MarketPrices({})
+
+MARKET_ADVICE = {
+    'up': "📈 Prices rising. Store for better returns.",
+    'down': "📉 Prices falling. Sell immediately.",
+    'stable': "➡️ Stable prices. Can sell or store."
+}
+
+def market_price(crop):
+    """Return the current price and short-term outlook for a crop"""
+    quote = market_prices.quote(crop)
+    return {
+        'success': True,
+        **quote,
+        'advice': MARKET_ADVICE[quote['trend']],
+        'source': 'Mandi Prices' if MARKET_PRICES_CSV else 'Market Analysis'
+    }
+
 @app.route('/api/market-prices')
 def get_market_prices():
     crop = request.args.get('crop', 'tomato')
-    
-    base_prices = {
-        'tomato': 35, 'onion': 28, 'potato': 18, 'brinjal': 25,
-        'chili': 45, 'carrot': 35, 'beans': 40, 'coriander': 60
-    }
-    current = base_prices.get(crop, 30)
-    
-    trend = random.choice(['up', 'down', 'stable'])
-    if trend == 'up':
-        next_week = current + random.randint(2, 5)
-        next_month = current + random.randint(5, 10)
-        advice = "📈 Prices rising. Store for better returns."
-    elif trend == 'down':
-        next_week = current - random.randint(2, 5)
-        next_month = current - random.randint(5, 10)
-        advice = "📉 Prices falling. Sell immediately."
-    else:
-        next_week = current
-        next_month = current
-        advice = "➡️ Stable prices. Can sell or store."
-    
-    return jsonify({
-        'success': True,
-        'current': current,
-        'next_week': max(5, next_week),
-        'next_month': max(5, next_month),
-        'trend': trend,
-        'advice': advice,
-        'source': 'Market Analysis'
-    })
+    report = market_price(crop)
+    days = request.args.get('history', type=int)
+    if days is not None:
+        report['history'] = market_prices.history(crop, max(1, min(days, 3650)))
+    return jsonify(report)
 
 # ============================================
 # AI CROP RECOMMENDATIONS
 # ============================================
 
-@app.route('/api/recommend-crops')
-def recommend_crops():
-    lat = request.args.get('lat', '10.7905')
-    lon = request.args.get('lon', '78.7045')
-    soil_ph = request.args.get('ph', type=float, default=6.5)
-    season = request.args.get('season', 'kharif')
-    
-    try:
-        weather_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true&daily=precipitation_sum&timezone=auto&forecast_days=1"
-        weather_resp = requests.get(weather_url, timeout=3)
-        weather_data = weather_resp.json()
-        current_temp = weather_data['current_weather']['temperature']
-    except:
-        current_temp = 28
-    
+# Card fields that only depend on the catalogue, built once
+CROP_CARDS = {
+    crop_id: {
+        'id': crop_id,
+        'name': crop['name'],
+        'name_ta': crop['name_ta'],
+        'name_ml': crop['name_ml'],
+        'name_te': crop['name_te'],
+        'icon': crop['icon'],
+        'days_to_harvest': crop['days_to_harvest']
+    }
+    for crop_id, crop in CROP_DATABASE.items()
+}
+
+def recommendation_cards(scores, in_season, season, prices=None, limit=6):
+    """Turn one row of crop scores into ranked recommendation cards"""
     recommendations = []
-    
-    for crop_id, crop in CROP_DATABASE.items():
-        if season not in crop['season']:
-            continue
-            
-        score = 100
-        
-        if soil_ph < crop['ph_min'] or soil_ph > crop['ph_max']:
-            score -= 15
-        
-        if current_temp < crop['temp_min'] or current_temp > crop['temp_max']:
-            score -= 10
-        
-        score = max(40, min(99, score))
-        
-        market_resp = get_market_prices().json
-        current_price = market_resp['current'] if market_resp.get('success') else 30
-        
+
+    for i in crop_table.ranked(scores, in_season)[:limit]:
+        crop_id = crop_table.ids[i]
+        score = int(scores[i])
+
+        if prices and crop_id in prices:
+            current_price = prices[crop_id]
+        else:
+            current_price = market_price(crop_id)['current']
+
         expected_yield = random.randint(800, 1200)
         profit = expected_yield * (current_price * 0.6)
-        
+
         recommendations.append({
-            'id': crop_id,
-            'name': crop['name'],
-            'name_ta': crop['name_ta'],
-            'name_ml': crop['name_ml'],
-            'name_te': crop['name_te'],
-            'icon': crop['icon'],
+            **CROP_CARDS[crop_id],
             'match_score': score,
-            'days_to_harvest': crop['days_to_harvest'],
-            'current_price': f"₹{current_price}/kg",
+            'current_price': f"₹{current_price:g}/kg",
             'profit_per_acre': f"₹{round(profit)}",
             'expected_yield': f"{expected_yield} kg/acre",
             'advice': f"Best for {season} season. {score}% match."
         })
-    
-    recommendations.sort(key=lambda x: x['match_score'], reverse=True)
-    
-    # Add to blockchain
+
+    return recommendations
+
+def build_recommendations(soil_ph, current_temp, season, prices=None, limit=6):
+    """Score every crop for the given soil pH and temperature, best in-season first"""
+    scores, in_season = crop_table.score(soil_ph, current_temp, season)
+    return recommendation_cards(scores[0], in_season[0], season, prices, limit)
+
+def record_recommendation(recommendations, lat, lon):
+    """Add the top recommendation to the blockchain"""
     if recommendations:
         top_crop = recommendations[0]
         blockchain.new_transaction(
@@ -396,19 +529,247 @@ def recommend_crops():
             quantity=random.randint(100, 500),
             location=f"{lat},{lon}"
         )
-    
-    return jsonify({
+
+def recommendation_report(recommendations, current_temp, soil_ph):
+    return {
         'success': True,
         'recommendations': recommendations[:6],
         'weather_temp': current_temp,
         'soil_ph': soil_ph
+    }
+
+# Composite mode: weather and soil pH are fetched in parallel under one
+# deadline instead of chaining per-source timeouts. Each fetch gets the
+# deadline as its own timeout (no retries), so an abandoned one frees its
+# thread soon after instead of holding it for the full retry schedule.
+RECOMMEND_BUDGET = float(os.environ.get('RECOMMEND_BUDGET', 2.5))
+
+fanout_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('FANOUT_THREADS', 16)),
+    thread_name_prefix='fanout'
+)
+
+def current_temperature(lat, lon, deadline=None):
+    return fetch_forecast(lat, lon, deadline)['current_weather']['temperature']
+
+def current_prices(crop_ids):
+    return {crop_id: market_price(crop_id)['current'] for crop_id in crop_ids}
+
+def composite_sources(lat, lon, budget):
+    """The upstream inputs of a composite recommendation as name -> (fn, args).
+
+    Market prices are local (no I/O) and are computed inline by the caller.
+    """
+    return {
+        'weather': (current_temperature, (lat, lon, budget)),
+        'soil': (fetch_soil_ph, (lat, lon, budget))
+    }
+
+def composite_budget(value):
+    """Clamp a requested deadline (seconds) to the configured maximum"""
+    try:
+        return max(0.1, min(RECOMMEND_BUDGET, float(value)))
+    except (TypeError, ValueError):
+        return RECOMMEND_BUDGET
+
+def composite_report(results, soil_ph, season, budget):
+    """Recommend from whichever inputs arrived in time; the rest use fallbacks"""
+    stale = [name for name in ('weather', 'soil', 'market') if name not in results]
+    current_temp = results.get('weather', 28)
+    if 'soil' in results:
+        soil_ph = round(results['soil'], 1)
+
+    recommendations = build_recommendations(soil_ph, current_temp, season, results.get('market'))
+    report = recommendation_report(recommendations, current_temp, soil_ph)
+    report.update({
+        'mode': 'composite',
+        'stale': stale,
+        'budget': budget
     })
+    return recommendations, report
+
+def gather_composite(lat, lon, budget):
+    """Run every composite source concurrently and keep those done within budget"""
+    futures = {
+        name: fanout_pool.submit(fn, *args)
+        for name, (fn, args) in composite_sources(lat, lon, budget).items()
+    }
+    results = {'market': current_prices(list(CROP_DATABASE))}
+    wait(futures.values(), timeout=budget)
+
+    for name, future in futures.items():
+        if future.done() and future.exception() is None:
+            results[name] = future.result()
+    return results
+
+def finite_float(name, value):
+    """float(value), refusing NaN and infinities (they would score and serialise as bare NaN)"""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f'{name} must be a finite number')
+    return value
+
+@app.route('/api/recommend-crops')
+def recommend_crops():
+    lat = request.args.get('lat', '10.7905')
+    lon = request.args.get('lon', '78.7045')
+    soil_ph = request.args.get('ph', type=float, default=6.5)
+    season = request.args.get('season', 'kharif')
+    if not math.isfinite(soil_ph):
+        return jsonify({'success': False, 'error': 'ph must be a finite number'}), 400
+
+    if request.args.get('mode') == 'composite':
+        budget = composite_budget(request.args.get('budget', RECOMMEND_BUDGET))
+        results = gather_composite(lat, lon, budget)
+        recommendations, report = composite_report(results, soil_ph, season, budget)
+        record_recommendation(recommendations, lat, lon)
+        return jsonify(report)
+
+    try:
+        weather_data = fetch_forecast(lat, lon, RECOMMEND_DEADLINE)
+        current_temp = weather_data['current_weather']['temperature']
+    except:
+        current_temp = 28
+
+    recommendations = build_recommendations(soil_ph, current_temp, season)
+    record_recommendation(recommendations, lat, lon)
+
+    return jsonify(recommendation_report(recommendations, current_temp, soil_ph))
+
+# ============================================
+# BATCH RECOMMENDATIONS (co-op / district scale)
+# ============================================
+
+BATCH_MAX_PLOTS = int(os.environ.get('BATCH_MAX_PLOTS', 1000))
+BATCH_CHUNK = 200
+
+# Batch forecast lookups get their own threads so a large batch cannot starve composite requests
+batch_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('BATCH_FETCH_THREADS', 8)),
+    thread_name_prefix='batch-fetch'
+)
+
+def parse_plot(plot, default_season):
+    """Validate one batch plot into (cell, ph, season, rain)"""
+    cell = grid_cell(plot.get('lat', '10.7905'), plot.get('lon', '78.7045'))
+    ph = finite_float('ph', plot.get('ph', 6.5))
+    rain = plot.get('rain')
+    # NaN is the scorer's "no rainfall given"; a NaN sent by the client is refused above
+    rain = float('nan') if rain is None else finite_float('rain', rain)
+    season = plot.get('season', default_season)
+    if not isinstance(season, str):
+        raise TypeError('season must be a string')
+    return cell, ph, season, rain
+
+def batch_recommendations(plots, season, prices):
+    """Yield one NDJSON line per plot, scoring each chunk of plots in one pass"""
+    parsed = []
+    for plot in plots:
+        try:
+            parsed.append(parse_plot(plot, season))
+        except (AttributeError, TypeError, ValueError) as e:
+            parsed.append(e)
+
+    # One forecast per grid cell, fetched up front so later chunks are ready sooner
+    cells = {p[0] for p in parsed if not isinstance(p, Exception)}
+    forecasts = {cell: batch_pool.submit(current_temperature, *cell, RECOMMEND_DEADLINE) for cell in cells}
+
+    for start in range(0, len(parsed), BATCH_CHUNK):
+        chunk = parsed[start:start + BATCH_CHUNK]
+        valid = [(i, p) for i, p in enumerate(chunk, start) if not isinstance(p, Exception)]
+
+        temps, stale = {}, set()
+        for cell in {p[0] for _, p in valid}:
+            try:
+                temps[cell] = forecasts[cell].result()
+            except Exception:
+                temps[cell] = 28
+                stale.add(cell)
+
+        rows = {}
+        if valid:
+            cells_, ph, seasons, rain = zip(*(p for _, p in valid))
+            scores, in_season = crop_table.score(
+                ph, [temps[c] for c in cells_], seasons, rain=rain)
+            rows = {i: row for row, (i, _) in enumerate(valid)}
+
+        for i, p in enumerate(chunk, start):
+            plot_id = plots[i].get('id', i) if isinstance(plots[i], dict) else i
+            if isinstance(p, Exception):
+                line = {'index': i, 'id': plot_id, 'success': False, 'error': str(p)}
+            else:
+                cell, ph, plot_season, _ = p
+                row = rows[i]
+                line = {
+                    'index': i,
+                    'id': plot_id,
+                    'success': True,
+                    'recommendations': recommendation_cards(
+                        scores[row], in_season[row], plot_season, prices),
+                    'weather_temp': temps[cell],
+                    'soil_ph': ph,
+                    'stale': ['weather'] if cell in stale else []
+                }
+            yield json.dumps(line) + '\n'
+
+@app.route('/api/recommend-crops/batch', methods=['POST'])
+def recommend_crops_batch():
+    """Recommend crops for many plots at once, streamed back as NDJSON"""
+    data = request.get_json(silent=True) or {}
+    plots = data.get('plots') if isinstance(data, dict) else None
+    if not isinstance(plots, list) or not plots:
+        return jsonify({'success': False, 'error': 'Expected a non-empty "plots" list'})
+    if len(plots) > BATCH_MAX_PLOTS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_PLOTS} plots per batch'})
+
+    prices = current_prices(crop_table.ids)
+    season = data.get('season', 'kharif')
+    return Response(batch_recommendations(plots, season, prices), mimetype='application/x-ndjson')
 
 # ============================================
 # SOIL ANALYSIS FROM IMAGE
 # ============================================
 
+# Image analysis results keyed by the SHA-256 of the upload: farmers often
+# re-send the same photo, and a hit skips both the analysis and SoilGrids.
+image_results = DiskCache(
+    os.environ.get('IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_cache')),
+    max_bytes=int(os.environ.get('IMAGE_CACHE_BYTES', 64 * 1024 * 1024))
+)
+
+# How far a confident soil-class match moves the SoilGrids pH towards the class's typical pH
+SOIL_IMAGE_WEIGHT = 0.4
+
+MAX_IMAGE_BYTES = int(os.environ.get('MAX_IMAGE_BYTES', 16 * 1024 * 1024))
+
+def image_upload(view):
+    """Reject oversized image uploads with 413 (by declared length before the
+    body is read, else by the spooled file's size). In debug mode the
+    request's peak traced allocation is returned in X-Peak-Memory."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if (request.content_length or 0) > MAX_IMAGE_BYTES:
+            return request_too_large(None)
+        if not app.debug:
+            return view(*args, **kwargs)
+        with peak_memory() as memory:
+            response = make_response(view(*args, **kwargs))
+        response.headers['X-Peak-Memory'] = str(memory['peak_bytes'])
+        return response
+    return wrapper
+
+def upload_size(stream):
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def soil_image_key(digest, lat, lon):
+    """Same photo within ~100 m maps to the same result"""
+    return content_key('soil', digest, round(float(lat), 3), round(float(lon), 3))
+
 @app.route('/api/analyze-soil-image', methods=['POST'])
+@image_upload
 def analyze_soil_image():
     if 'image' not in request.files:
         return jsonify({'success': False, 'error': 'No image uploaded'})
@@ -418,16 +779,26 @@ def analyze_soil_image():
     lon = request.form.get('lon', '78.7045')
     
     try:
-        image_bytes = image_file.read()
+        # Hash and decode straight from the spooled upload
+        if upload_size(image_file.stream) > MAX_IMAGE_BYTES:
+            return request_too_large(None)
+        key = soil_image_key(file_digest(image_file.stream), lat, lon)
+        cached = image_results.get(key)
+        if cached is not None:
+            return jsonify(cached)
+        
+        features = soil_image.analyze(image_file.stream)
+        if features is None:
+            return jsonify({'success': False, 'error': 'No soil visible in the photo'})
         
-        soil_resp = get_soil()
-        soil_data = soil_resp.json
+        soil_data = soil_lookup(lat, lon)
         
         if soil_data['success']:
-            ph = soil_data['ph']
-            ph_variation = (hash(str(image_bytes)) % 10) / 10 - 0.5
-            ph = round(ph + ph_variation, 1)
-            ph = max(4.5, min(8.5, ph))
+            # Pull the SoilGrids reading towards the pH typical of the photo's soil class
+            weight = SOIL_IMAGE_WEIGHT * features['confidence']
+            ph = soil_data['ph'] * (1 - weight) + features['typical_ph'] * weight
+            ph = round(max(4.5, min(8.5, ph)), 1)
+            report = soil_report(ph)
             
             if ph < 6:
                 nitrogen = "Medium"
@@ -442,16 +813,24 @@ def analyze_soil_image():
                 phosphorus = "Medium"
                 potassium = "Low"
                 
-            return jsonify({
+            result = {
                 'success': True,
                 'ph': ph,
                 'nitrogen': nitrogen,
                 'phosphorus': phosphorus,
                 'potassium': potassium,
-                'classification': soil_data['classification'],
-                'recommendation': soil_data['recommendation'],
+                'classification': report['classification'],
+                'recommendation': report['recommendation'],
+                'soil_type': features['soil_type'],
+                'munsell': features['munsell'],
+                'confidence': features['confidence'],
+                'features': features,
                 'source': 'AI Image Analysis + SoilGrids'
-            })
+            }
+            # Don't pin the approximate fallback; retry SoilGrids next time
+            if soil_data is not SOIL_FALLBACK:
+                image_results.set(key, result)
+            return jsonify(result)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
     
@@ -461,74 +840,210 @@ def analyze_soil_image():
 # INTERCROPPING RECOMMENDATIONS
 # ============================================
 
-@app.route('/api/intercropping')
-def get_intercropping():
-    main_crop = request.args.get('crop', 'tomato')
-    
+def intercropping_report(main_crop):
+    """Companion advice for one crop (static: depends only on CROP_DATABASE)"""
     if main_crop not in CROP_DATABASE:
-        return jsonify({'success': False, 'error': 'Crop not found'})
-    
+        return {'success': False, 'error': 'Crop not found'}
+
     crop = CROP_DATABASE[main_crop]
     
     good = []
-    for comp_id in crop['companions']:
-        if comp_id in CROP_DATABASE:
-            comp = CROP_DATABASE[comp_id]
-            good.append({
-                'id': comp_id,
-                'name': comp['name'],
-                'name_ta': comp['name_ta'],
-                'name_ml': comp['name_ml'],
-                'name_te': comp['name_te'],
-                'icon': comp['icon'],
-                'benefit': f"Enhances growth and repels pests"
-            })
+    for comp_id in companion_graph.declared_good[main_crop]:
+        comp = CROP_DATABASE[comp_id]
+        good.append({
+            'id': comp_id,
+            'name': comp['name'],
+            'name_ta': comp['name_ta'],
+            'name_ml': comp['name_ml'],
+            'name_te': comp['name_te'],
+            'icon': comp['icon'],
+            'benefit': f"Enhances growth and repels pests"
+        })
     
     bad = []
-    for comp_id in crop['bad_companions']:
-        if comp_id in CROP_DATABASE:
-            comp = CROP_DATABASE[comp_id]
-            bad.append({
-                'id': comp_id,
-                'name': comp['name'],
-                'name_ta': comp['name_ta'],
-                'name_ml': comp['name_ml'],
-                'name_te': comp['name_te'],
-                'icon': comp['icon'],
-                'reason': "Competes for nutrients and attracts similar pests"
-            })
+    for comp_id in companion_graph.declared_bad[main_crop]:
+        comp = CROP_DATABASE[comp_id]
+        bad.append({
+            'id': comp_id,
+            'name': comp['name'],
+            'name_ta': comp['name_ta'],
+            'name_ml': comp['name_ml'],
+            'name_te': comp['name_te'],
+            'icon': comp['icon'],
+            'reason': "Competes for nutrients and attracts similar pests"
+        })
     
-    return jsonify({
+    return {
         'success': True,
         'main_crop': crop['name'],
         'main_icon': crop['icon'],
         'good': good,
         'bad': bad
+    }
+
+# Every answer /api/intercropping can give, serialised once; None = unknown crop
+SNAPSHOT_MAX_AGE = int(os.environ.get('SNAPSHOT_MAX_AGE', 3600))
+intercropping_snapshots = SnapshotSet(max_age=SNAPSHOT_MAX_AGE)
+for crop_id in list(CROP_DATABASE) + [None]:
+    intercropping_snapshots.add(crop_id, intercropping_report(crop_id))
+
+@app.route('/api/intercropping')
+def get_intercropping():
+    snapshot = intercropping_snapshots.get(request.args.get('crop', 'tomato'))
+    return (snapshot or intercropping_snapshots.get(None)).response(request)
+
+# Seconds the planner may search before answering with its best plan so far
+PLAN_BUDGET = float(os.environ.get('PLAN_BUDGET', 0.25))
+PLAN_MAX_CROPS = 6
+
+@app.route('/api/intercropping/plan')
+def plan_intercropping():
+    """Best set of k mutually compatible crops for a plot's soil, temperature and season"""
+    k = request.args.get('k', type=int, default=3)
+    if not 1 <= k <= min(PLAN_MAX_CROPS, len(companion_graph)):
+        return jsonify({'success': False, 'error': f'k must be between 1 and {min(PLAN_MAX_CROPS, len(companion_graph))}'})
+    required = [c for c in request.args.get('require', '').split(',') if c]
+    unknown = [c for c in required if c not in CROP_DATABASE]
+    if unknown:
+        return jsonify({'success': False, 'error': f"Unknown crop: {', '.join(unknown)}"})
+    soil_ph = request.args.get('ph', type=float, default=6.5)
+    season = request.args.get('season', 'kharif')
+    current_temp = request.args.get('temp', type=float)
+    if current_temp is None:
+        try:
+            current_temp = current_temperature(request.args.get('lat', '10.7905'), request.args.get('lon', '78.7045'),
+                                               RECOMMEND_DEADLINE)
+        except:
+            current_temp = 28
+    strict = request.args.get('strict') in ('1', 'true')
+
+    # Weight = match score; out-of-season crops only appear if required
+    scores, in_season = crop_table.score(soil_ph, current_temp, season)
+    weights = {crop_id: int(scores[0][i]) if in_season[0][i] else 0
+               for i, crop_id in enumerate(crop_table.ids)}
+    result = companion_graph.plan(weights, k, required, strict=strict, budget=PLAN_BUDGET)
+    if result is None:
+        return jsonify({'success': False, 'error': f'No {k} compatible crops for this plot'})
+
+    crop_ids, score, optimal = result
+    pairs = [[a, b] for i, a in enumerate(crop_ids) for b in crop_ids[i + 1:]
+             if companion_graph.companion[companion_graph.index[a]] >> companion_graph.index[b] & 1]
+    return jsonify({
+        'success': True,
+        'crops': [{
+            'id': crop_id,
+            'name': CROP_DATABASE[crop_id]['name'],
+            'name_ta': CROP_DATABASE[crop_id]['name_ta'],
+            'name_ml': CROP_DATABASE[crop_id]['name_ml'],
+            'name_te': CROP_DATABASE[crop_id]['name_te'],
+            'icon': CROP_DATABASE[crop_id]['icon'],
+            'match_score': weights[crop_id]
+        } for crop_id in crop_ids],
+        'companion_pairs': pairs,
+        'score': score,
+        'optimal': optimal,
+        'season': season,
+        'weather_temp': current_temp,
+        'soil_ph': soil_ph
     })
 
 # ============================================
 # BLOCKCHAIN API
 # ============================================
 
+PAGE_LIMIT_MAX = 500
+
+def page_limit(default=50):
+    return max(1, min(PAGE_LIMIT_MAX, request.args.get('limit', type=int, default=default)))
+
+def parse_time(value):
+    """Accept a unix timestamp or an ISO-8601 date/time"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
 @app.route('/api/blockchain')
 def get_blockchain():
-    """Get the entire blockchain"""
+    """Get a page of blocks, newest first; pass ?before=<next_cursor> for older ones"""
+    blocks = blockchain.store.blocks_page(request.args.get('before', type=int), page_limit())
     return jsonify({
         'success': True,
-        'chain': blockchain.chain,
-        'length': len(blockchain.chain),
-        'transactions': blockchain.get_all_transactions()
+        'chain': blocks,
+        'length': len(blockchain),
+        'transaction_count': blockchain.store.count_transactions(),
+        'pending_count': blockchain.pending_count(),
+        'next_cursor': blocks[-1]['index'] if blocks and blocks[-1]['index'] > 1 else None
     })
 
 @app.route('/api/blockchain/transactions')
 def get_transactions():
-    """Get all transactions"""
+    """Query transactions by farmer, crop, location and time range, newest first"""
+    status = request.args.get('status', 'sealed')
+    if status not in ('sealed', 'pending', 'all'):
+        return jsonify({'success': False, 'error': 'status must be sealed, pending or all'})
+    try:
+        filters = {
+            'status': status,
+            'farmer': request.args.get('farmer'),
+            'crop': request.args.get('crop'),
+            'location': request.args.get('location'),
+            'since': parse_time(request.args.get('since')),
+            'until': parse_time(request.args.get('until'))
+        }
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+    transactions, next_cursor = blockchain.store.transactions_page(
+        cursor=request.args.get('cursor', type=int), limit=page_limit(), **filters)
     return jsonify({
         'success': True,
-        'transactions': blockchain.get_all_transactions(),
-        'count': len(blockchain.get_all_transactions())
+        'transactions': transactions,
+        'count': blockchain.store.count_transactions(**filters),
+        'next_cursor': next_cursor
     })
 
+EXPORT_PAGE = 32
+
+def export_ndjson(tip_index):
+    """One line per block header, followed by one line per transaction in it"""
+    for block in blockchain.store.iter_blocks(page=EXPORT_PAGE, stop=tip_index):
+        header = {k: v for k, v in block.items() if k != 'transactions'}
+        header['hash'] = blockchain.hash(block)
+        header['transaction_count'] = len(block['transactions'])
+        yield json.dumps(dict(header, type='block')) + '\n'
+        for position, tx in enumerate(block['transactions']):
+            yield json.dumps(dict(tx, type='transaction', block_index=block['index'],
+                                  position=position)) + '\n'
+
+def export_json(tip_index):
+    """The /api/blockchain document, written one block at a time"""
+    yield '{"success": true, "chain": ['
+    for block in blockchain.store.iter_blocks(page=EXPORT_PAGE, stop=tip_index):
+        yield (',' if block['index'] > 1 else '') + json.dumps(block)
+    yield f'], "length": {tip_index}}}'
+
+@app.route('/api/blockchain/export')
+def export_blockchain():
+    """Stream the sealed ledger as NDJSON (default) or JSON; ETag is the tip block hash"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        return jsonify({'success': False, 'error': 'format must be ndjson or json'})
+
+    tip_index, _, tip_hash = blockchain.store.tip()
+    etag = f'{tip_hash}-{fmt}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif fmt == 'json':
+        response = Response(export_json(tip_index), mimetype='application/json')
+    else:
+        response = Response(export_ndjson(tip_index), mimetype='application/x-ndjson')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/add-transaction', methods=['POST'])
 def add_transaction():
     """Add a new transaction to the blockchain"""
@@ -559,56 +1074,145 @@ def add_transaction():
             'error': str(e)
         })
 
+# Bulk uploads are refused (429) once this many transactions await mining
+MAX_PENDING_TRANSACTIONS = int(os.environ.get('MAX_PENDING_TRANSACTIONS', 200000))
+BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS', 100000))
+
+def bulk_rows():
+    """Rows from a CSV body, an uploaded CSV file, or a JSON array"""
+    if 'file' in request.files:
+        return rows_from_csv(request.files['file'].read().decode('utf-8-sig'))
+    if request.mimetype == 'text/csv':
+        return rows_from_csv(request.get_data(as_text=True))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('transactions')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of transactions or CSV')
+    return data
+
+@app.route('/api/add-transactions/bulk', methods=['POST'])
+def add_transactions_bulk():
+    """Validate and append many transactions in one batch; ?atomic=1 rejects the batch on any error"""
+    try:
+        rows = bulk_rows()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'success': False, 'error': str(e)})
+    if len(rows) > BULK_MAX_ROWS:
+        return jsonify({'success': False, 'error': f'At most {BULK_MAX_ROWS} rows per upload'})
+
+    valid, errors = validate_rows(rows)
+    if errors and request.args.get('atomic') in ('1', 'true'):
+        return jsonify({'success': False, 'accepted': 0, 'rejected': len(errors), 'errors': errors})
+
+    pending = blockchain.pending_count()
+    if pending + len(valid) > MAX_PENDING_TRANSACTIONS:
+        response = jsonify({
+            'success': False,
+            'error': 'Pending transaction pool is full; retry after the next block is mined',
+            'pending': pending
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = '5'
+        return response
+
+    try:
+        index = blockchain.new_transactions([tx for _, tx in valid]) if valid else None
+    except sqlite3.OperationalError as e:
+        # Nothing was written; the rows wait in the mempool for the next flush
+        response = jsonify({
+            'success': False,
+            'error': f'Ledger is busy ({e}); the accepted rows are queued and will be written by the next flush',
+            'queued': len(valid),
+            'rejected': len(errors),
+            'errors': errors
+        })
+        response.status_code = 503
+        return response
+    return jsonify({
+        'success': not errors,
+        'accepted': len(valid),
+        'rejected': len(errors),
+        'block': index,
+        'errors': errors
+    })
+
+@app.route('/api/blockchain/proof')
+def get_transaction_proof():
+    """Merkle inclusion proof for one transaction"""
+    block_index = request.args.get('block', type=int)
+    tx_index = request.args.get('tx', type=int, default=0)
+    block = blockchain.store.get_block(block_index) if block_index is not None else None
+    if block is None:
+        return jsonify({'success': False, 'error': 'Block not found'})
+    if not 0 <= tx_index < len(block['transactions']):
+        return jsonify({'success': False, 'error': 'Transaction not found'})
+    return jsonify({'success': True, 'proof': blockchain.merkle_proof(block_index, tx_index)})
+
+@app.route('/api/blockchain/validate')
+def validate_blockchain():
+    """Audit hash links, proofs and Merkle roots; ?full=1 ignores the last checkpoint"""
+    report = validate_chain(blockchain, full=request.args.get('full') in ('1', 'true'))
+    return jsonify(dict(report, success=True))
+
+@app.route('/api/mine', methods=['POST'])
+def mine():
+    """Seal pending transactions into a new block with proof-of-work"""
+    block = blockchain.mine()
+    if block is None:
+        return jsonify({'success': False, 'error': 'No pending transactions to mine'})
+    return jsonify({
+        'success': True,
+        'message': f'Block {block["index"]} forged',
+        'block': block,
+        'difficulty': blockchain.difficulty
+    })
+
+def background_miner(interval):
+    """Periodically seal whatever transactions are pending"""
+    while True:
+        sleep(interval)
+        try:
+            while blockchain.mine() is not None:
+                pass
+        except Exception as e:
+            app.logger.warning('Background mining failed: %s', e)
+
+# Set AUTO_MINE_INTERVAL (seconds) to seal pending transactions without /api/mine
+AUTO_MINE_INTERVAL = float(os.environ.get('AUTO_MINE_INTERVAL', 0))
+if AUTO_MINE_INTERVAL > 0:
+    threading.Thread(target=background_miner, args=(AUTO_MINE_INTERVAL,),
+                     daemon=True, name='miner').start()
+
 # ============================================
 # CHATBOT API
 # ============================================
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    data = request.json
-    message = data.get('message', '').lower()
+    data = request.get_json(silent=True) or {}
+    message = str(data.get('message', ''))
     lang = data.get('lang', 'en')
-    
-    responses = {
-        'en': {
-            'tomato': 'Tomatoes grow best in loamy soil with pH 6.0-6.8. Plant in Kharif season. They need 20-27°C temperature and take 60 days to harvest.',
-            'onion': 'Onions need well-drained soil with pH 6.0-7.0. They prefer 13-25°C and take 150 days to mature. Plant in Rabi season.',
-            'weather': 'Check our weather section for real-time updates! We use live data from Open-Meteo API.',
-            'price': 'Current market prices are available in the Market Guru section. Prices update regularly based on mandi data.',
-            'soil': 'Soil health is crucial! Use our Soil Doctor feature to analyze your soil pH and nutrients.',
-            'default': 'I can help with crop advice, weather, prices, soil analysis, and farming tips! What would you like to know?'
-        },
-        'ta': {
-            'tomato': 'தக்காளி வளமான மண்ணில் 6.0-6.8 pH இல் வளரும். காரீப் பருவத்தில் நடவும். 20-27°C வெப்பநிலை தேவை. அறுவடைக்கு 60 நாட்கள் ஆகும்.',
-            'default': 'நான் பயிர் ஆலோசனை, வானிலை, விலைகள், மண் பகுப்பாய்வு மற்றும் விவசாய குறிப்புகளுக்கு உதவ முடியும்!'
-        },
-        'ml': {
-            'tomato': 'തക്കാളി 6.0-6.8 pH ഉള്ള ഫലഭൂയിഷ്ഠമായ മണ്ണിൽ വളരുന്നു. ഖാരിഫ് സീസണിൽ നടുക. 20-27°C താപനില ആവശ്യമാണ്. വിളവെടുപ്പിന് 60 ദിവസം.',
-            'default': 'വിള ഉപദേശം, കാലാവസ്ഥ, വിലകൾ, മണ്ണ് വിശകലനം എന്നിവയിൽ എനിക്ക് സഹായിക്കാനാകും!'
-        },
-        'te': {
-            'tomato': 'టమోటాలు 6.0-6.8 pH ఉన్న సారవంతమైన నేలలో బాగా పెరుగుతాయి. ఖరీఫ్ సీజన్‌లో నాటండి. 20-27°C ఉష్ణోగ్రత అవసరం. కోతకు 60 రోజులు పడుతుంది.',
-            'default': 'పంట సలహా, వాతావరణం, ధరలు, నేల విశ్లేషణ మరియు వ్యవసాయ చిట్కాలతో నేను సహాయపడగలను!'
-        }
-    }
-    
-    reply = responses[lang]['default']
-    for key in responses['en']:
-        if key in message and key in responses[lang]:
-            reply = responses[lang][key]
-            break
-    
-    return jsonify({'reply': reply})
+    return jsonify({'reply': chat_index.reply(message, lang)})
 
 # ============================================
 # DISEASE DETECTION (AI Simulation)
 # ============================================
 
 @app.route('/api/detect-disease', methods=['POST'])
+@image_upload
 def detect_disease():
     if 'image' not in request.files:
         return jsonify({'success': False, 'error': 'No image'})
     
+    stream = request.files['image'].stream
+    if upload_size(stream) > MAX_IMAGE_BYTES:
+        return request_too_large(None)
+    key = content_key('disease', file_digest(stream))
+    cached = image_results.get(key)
+    if cached is not None:
+        return jsonify(cached)
+    
     diseases = [
         {
             'name': 'Early Blight',
@@ -642,41 +1246,42 @@ def detect_disease():
     
     result = random.choice(diseases)
     
-    return jsonify({
+    report = {
         'success': True,
         'disease': result['name'],
         'confidence': result['confidence'],
         'symptoms': result['symptoms'],
         'organic_treatment': result['organic'],
         'chemical_treatment': result['chemical']
-    })
+    }
+    image_results.set(key, report)
+    return jsonify(report)
 
 # ============================================
 # COMPARE FARMS
 # ============================================
 
+NEARBY_FARMS = [
+    {'name': 'Green Fields', 'crop': 'Tomato', 'yield': 1200, 'profit': 42000, 'icon': '🍅'},
+    {'name': 'Sunrise Farm', 'crop': 'Onion', 'yield': 1100, 'profit': 30800, 'icon': '🧅'},
+    {'name': 'River Side', 'crop': 'Brinjal', 'yield': 950, 'profit': 23750, 'icon': '🍆'},
+    {'name': 'Mountain View', 'crop': 'Chili', 'yield': 800, 'profit': 36000, 'icon': '🌶️'},
+    {'name': 'Valley Farm', 'crop': 'Potato', 'yield': 1300, 'profit': 23400, 'icon': '🥔'}
+]
+# The farm list is serialised once; only the caller's own figures change per request
+NEARBY_FARMS_JSON = json.dumps(NEARBY_FARMS, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
 @app.route('/api/compare-farms')
 def compare_farms():
-    lat = request.args.get('lat', '10.7905')
-    lon = request.args.get('lon', '78.7045')
-    
-    farms = [
-        {'name': 'Green Fields', 'crop': 'Tomato', 'yield': 1200, 'profit': 42000, 'icon': '🍅'},
-        {'name': 'Sunrise Farm', 'crop': 'Onion', 'yield': 1100, 'profit': 30800, 'icon': '🧅'},
-        {'name': 'River Side', 'crop': 'Brinjal', 'yield': 950, 'profit': 23750, 'icon': '🍆'},
-        {'name': 'Mountain View', 'crop': 'Chili', 'yield': 800, 'profit': 36000, 'icon': '🌶️'},
-        {'name': 'Valley Farm', 'crop': 'Potato', 'yield': 1300, 'profit': 23400, 'icon': '🥔'}
-    ]
-    
     my_yield = random.randint(900, 1400)
     my_profit = my_yield * random.randint(25, 35)
-    
-    return jsonify({
-        'success': True,
-        'farms': farms,
-        'my_yield': my_yield,
-        'my_profit': my_profit
-    })
+
+    # Keys in jsonify()'s sorted order
+    body = b'{"farms":%s,"my_profit":%d,"my_yield":%d,"success":true}\n' % (
+        NEARBY_FARMS_JSON, my_profit, my_yield)
+    response = Response(body, mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 # ============================================
 # MAIN ROUTE
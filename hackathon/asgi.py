@@ -0,0 +1,173 @@
+# asgi.py - asyncio (ASGI) serving mode for the I/O-bound API routes
+#
+#   uvicorn asgi:application --port 5000
+#
+# The weather, rain-alert, soil and recommendation routes are served on the
+# event loop and await their upstream fetches, so a slow Open-Meteo or
+# SoilGrids reply no longer pins a server worker. The fetches run on a bounded
+# I/O pool so they share the forecast cache, single-flight and pooled HTTP
+# client with the Flask app. Every other route is delegated to the Flask app.
+
+import asyncio
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (
+    app as flask_app, fetch_forecast, soil_lookup, weather_report,
+    rain_alert_report, RAIN_ALERT_UNAVAILABLE, build_recommendations,
+    record_recommendation, recommendation_report, composite_sources,
+    composite_budget, composite_report, current_prices, CROP_DATABASE,
+    RECOMMEND_BUDGET, UPSTREAM_DEADLINE, RECOMMEND_DEADLINE
+)
+
+DEFAULT_LAT = '10.7905'
+DEFAULT_LON = '78.7045'
+
+io_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_IO_THREADS', 32)),
+    thread_name_prefix='upstream-io'
+)
+wsgi_fallback = WsgiToAsgi(flask_app)
+
+
+async def run_io(fn, *args):
+    """Await a blocking upstream call on the I/O pool"""
+    return await asyncio.get_running_loop().run_in_executor(io_pool, fn, *args)
+
+
+def _arg(query, name, default):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def _float_arg(query, name, default):
+    try:
+        return float(_arg(query, name, default))
+    except ValueError:
+        return default
+
+# ============================================
+# ASYNC ROUTE HANDLERS
+# ============================================
+
+async def weather(query):
+    lat = _arg(query, 'lat', DEFAULT_LAT)
+    lon = _arg(query, 'lon', DEFAULT_LON)
+    try:
+        return weather_report(await run_io(fetch_forecast, lat, lon, UPSTREAM_DEADLINE))
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+async def rain_alert(query):
+    lat = _arg(query, 'lat', DEFAULT_LAT)
+    lon = _arg(query, 'lon', DEFAULT_LON)
+    try:
+        return rain_alert_report(await run_io(fetch_forecast, lat, lon, UPSTREAM_DEADLINE))
+    except Exception:
+        return RAIN_ALERT_UNAVAILABLE
+
+
+async def soil(query):
+    lat = _arg(query, 'lat', DEFAULT_LAT)
+    lon = _arg(query, 'lon', DEFAULT_LON)
+    return await run_io(soil_lookup, lat, lon)
+
+
+async def gather_composite(lat, lon, budget):
+    """Await every composite source concurrently and keep those done within budget"""
+    tasks = {
+        name: asyncio.ensure_future(run_io(fn, *args))
+        for name, (fn, args) in composite_sources(lat, lon, budget).items()
+    }
+    results = {'market': current_prices(list(CROP_DATABASE))}
+    await asyncio.wait(tasks.values(), timeout=budget)
+
+    for name, task in tasks.items():
+        if task.done() and task.exception() is None:
+            results[name] = task.result()
+        elif not task.done():
+            task.cancel()
+    return results
+
+
+async def recommend_crops(query):
+    lat = _arg(query, 'lat', DEFAULT_LAT)
+    lon = _arg(query, 'lon', DEFAULT_LON)
+    soil_ph = _float_arg(query, 'ph', 6.5)
+    season = _arg(query, 'season', 'kharif')
+    if not math.isfinite(soil_ph):
+        return {'success': False, 'error': 'ph must be a finite number'}, 400
+
+    if _arg(query, 'mode', None) == 'composite':
+        budget = composite_budget(_arg(query, 'budget', RECOMMEND_BUDGET))
+        results = await gather_composite(lat, lon, budget)
+        recommendations, report = composite_report(results, soil_ph, season, budget)
+        await run_io(record_recommendation, recommendations, lat, lon)
+        return report
+
+    try:
+        weather_data = await run_io(fetch_forecast, lat, lon, RECOMMEND_DEADLINE)
+        current_temp = weather_data['current_weather']['temperature']
+    except Exception:
+        current_temp = 28
+
+    recommendations = build_recommendations(soil_ph, current_temp, season)
+    await run_io(record_recommendation, recommendations, lat, lon)
+    return recommendation_report(recommendations, current_temp, soil_ph)
+
+
+ROUTES = {
+    '/api/weather': weather,
+    '/api/rain-alert': rain_alert,
+    '/api/soil': soil,
+    '/api/recommend-crops': recommend_crops,
+}
+
+# ============================================
+# ASGI ENTRY POINT
+# ============================================
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            io_pool.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _send_json(send, payload, status=200):
+    body = json.dumps(payload, sort_keys=True).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    handler = ROUTES.get(scope['path']) if scope['type'] == 'http' else None
+    if handler is None or scope['method'] not in ('GET', 'HEAD'):
+        return await wsgi_fallback(scope, receive, send)
+
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    # Handlers return a payload, or (payload, status) like Flask views
+    result = await handler(query)
+    payload, status = result if isinstance(result, tuple) else (result, 200)
+    await _send_json(send, payload, status)
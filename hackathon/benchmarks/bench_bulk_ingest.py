@@ -0,0 +1,64 @@
+# bench_bulk_ingest.py - Rows/s for POST /api/add-transactions/bulk and its stages
+#
+#   python benchmarks/bench_bulk_ingest.py [rows] [runs]
+#
+# Stages use a fresh ledger per run; end-to-end runs append to one ledger,
+# so later runs insert into larger indexes. Prints the best and worst run.
+
+import json
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LEDGER_PATH', os.path.join(tempfile.mkdtemp(), 'ledger.db'))
+os.environ.setdefault('BULK_MAX_ROWS', '1000000')
+os.environ.setdefault('MAX_PENDING_TRANSACTIONS', '100000000')
+
+from app import app  # noqa: E402
+from blockchain import Blockchain  # noqa: E402
+from bulk_ingest import validate_rows  # noqa: E402
+
+
+def make_rows(n):
+    crops = ('rice', 'wheat', 'tomato', 'onion', 'potato', 'cotton')
+    return [{'farmer': f'farmer {i % 2000}', 'crop': crops[i % len(crops)],
+             'price': 20 + i % 37, 'quantity': round(1 + i * 0.001, 3),
+             'location': f'village {i % 40}'} for i in range(n)]
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        fn()
+        times.append(perf_counter() - start)
+    return times
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rows = make_rows(n)
+    body = json.dumps(rows)
+    valid = [tx for _, tx in validate_rows(rows)[0]]
+    client = app.test_client()
+
+    def store():
+        chain = Blockchain(difficulty=1, path=os.path.join(tempfile.mkdtemp(), 'ledger.db'))
+        chain.new_transactions(valid)
+
+    def post():
+        response = client.post('/api/add-transactions/bulk', data=body, content_type='application/json')
+        assert response.get_json()['accepted'] == n
+
+    for label, fn in (('validate', lambda: validate_rows(rows)),
+                      ('hash + insert', store),
+                      ('end to end', post)):
+        times = timed(fn, runs)
+        print(f'{label:>14}: {n / min(times):>10,.0f} rows/s best, {n / max(times):>10,.0f} worst')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# bench_chat.py - Per-message cost of /api/chat intent matching
+#
+#   python benchmarks/bench_chat.py [repeats]
+#
+# Compares ChatIndex.reply with the route's original logic (canned replies
+# rebuilt per call, five English keywords). Runs are interleaved and the
+# fastest of `repeats` is reported, as this is sensitive to machine noise.
+
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LEDGER_PATH', os.path.join(tempfile.mkdtemp(), 'ledger.db'))
+
+from app import CROP_DATABASE  # noqa: E402
+from chat import ChatIndex  # noqa: E402
+
+MESSAGES = [
+    'How do I grow tomato in my field?',
+    'what is the weather like tomorrow',
+    'Tell me the market price of onion',
+    'hello there, any farming tips for this season?',
+]
+MALAYALAM = 'എന്റെ കാരറ്റിന് ഏത് മണ്ണ് നല്ലതാണ്?'
+
+
+def original(message, lang='en'):
+    message = message.lower()
+    responses = {'en': {'tomato': 't', 'onion': 'o', 'weather': 'w', 'price': 'p', 'soil': 's',
+                        'default': 'd'}}
+    reply = responses[lang]['default']
+    for key in responses['en']:
+        if key in message and key in responses[lang]:
+            reply = responses[lang][key]
+            break
+    return reply
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+    index = ChatIndex(CROP_DATABASE)
+    runs = {
+        'original': (lambda: [original(m) for m in MESSAGES], len(MESSAGES)),
+        'ChatIndex.reply': (lambda: [index.reply(m) for m in MESSAGES], len(MESSAGES)),
+        'ChatIndex.reply (ml)': (lambda: index.reply(MALAYALAM, 'ml'), 1),
+    }
+    best = dict.fromkeys(runs, float('inf'))
+    for _ in range(repeats):
+        for name, (fn, _) in runs.items():
+            best[name] = min(best[name], timeit.timeit(fn, number=2000) / 2000)
+    for name, (_, messages) in runs.items():
+        print(f'{name:>22}: {best[name] / messages * 1e6:6.2f} us/message')
+    build = timeit.timeit(lambda: ChatIndex(CROP_DATABASE), number=50) / 50
+    print(f'{"build":>22}: {build * 1e3:6.2f} ms, {len(index.index.keywords)} keywords')
+
+
+if __name__ == '__main__':
+    main()
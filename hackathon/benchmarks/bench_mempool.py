@@ -0,0 +1,65 @@
+# bench_mempool.py - new_transaction() throughput at 1-32 writer threads
+#
+#   python benchmarks/bench_mempool.py [transactions] [runs]
+#
+# Each mode is run with the striped mempool and with a single stripe (one
+# shared lock). In the default mode every call flushes under _flush_lock, so
+# writers serialise on the ledger commit whatever the striping; the stripes
+# only pay off with a flush interval, where writers just append to the
+# mempool. Interval timings include the final flush. Prints the best run.
+
+import os
+import sys
+import tempfile
+import threading
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import Blockchain  # noqa: E402
+from mempool import Mempool  # noqa: E402
+
+THREADS = (1, 2, 4, 8, 16, 32)
+CROPS = ('rice', 'wheat', 'tomato', 'onion', 'potato', 'cotton')
+
+
+def run(n, threads, flush_interval, stripes):
+    chain = Blockchain(difficulty=1, path=os.path.join(tempfile.mkdtemp(), 'ledger.db'),
+                       flush_interval=flush_interval)
+    chain.mempool = Mempool(stripes)
+    per_thread = n // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def writer(w):
+        barrier.wait()
+        for i in range(per_thread):
+            chain.new_transaction(f'farmer {w}', CROPS[i % len(CROPS)], 20.0, 5.0, f'village {i % 40}')
+
+    workers = [threading.Thread(target=writer, args=(w,)) for w in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = perf_counter()
+    for worker in workers:
+        worker.join()
+    chain.flush()
+    elapsed = perf_counter() - start
+    assert chain.store.pending_count() == per_thread * threads
+    return per_thread * threads / elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    modes = (('default (flush per call)', None), ('interval (0.05 s)', 0.05))
+    for label, interval in modes:
+        print(f'{label}: transactions/s, best of {runs}')
+        print(f'{"threads":>8} {"16 stripes":>12} {"1 stripe":>12}')
+        for threads in THREADS:
+            striped = max(run(n, threads, interval, 16) for _ in range(runs))
+            single = max(run(n, threads, interval, 1) for _ in range(runs))
+            print(f'{threads:>8} {striped:>12,.0f} {single:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main()
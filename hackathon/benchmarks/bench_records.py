@@ -0,0 +1,57 @@
+# bench_records.py - Memory held by ledger transactions as dicts vs Transaction records
+#
+#   python benchmarks/bench_records.py [transactions]
+#
+# Rows cycle through 2000 farmers x 6 crops x 40 locations. Each row's strings
+# are built fresh, as a JSON request or a database cursor hands them over, so
+# the dict keeps its own copies while Transaction interns them. Memory is
+# what tracemalloc sees still allocated once all records are built.
+
+import gc
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Transaction  # noqa: E402
+
+CROPS = (b'rice', b'wheat', b'tomato', b'onion', b'potato', b'cotton')
+
+
+def row(i):
+    return (f'farmer {i % 2000}', CROPS[i % len(CROPS)].decode(), 20.0 + i % 37,
+            round(1 + i * 0.001, 3), f'village {i % 40}', 1700000000.0 + i)
+
+
+def as_dict(i):
+    return dict(zip(Transaction.FIELDS, row(i)))
+
+
+def as_record(i):
+    return Transaction(*row(i))
+
+
+def measure(build, n):
+    gc.collect()
+    tracemalloc.start()
+    start = perf_counter()
+    records = [build(i) for i in range(n)]
+    elapsed = perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return held, elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    results = {label: measure(build, n) for label, build in (('dict', as_dict), ('Transaction', as_record))}
+    for label, (held, elapsed) in results.items():
+        print(f'{label:>12}: {held / 2**20:>8,.1f} MiB, {held / n:>6.0f} B/transaction, built in {elapsed:.2f} s')
+    print(f'{"saving":>12}: {1 - results["Transaction"][0] / results["dict"][0]:.0%}')
+
+
+if __name__ == '__main__':
+    main()
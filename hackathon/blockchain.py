@@ -2,61 +2,187 @@
 
 import hashlib
 import json
-from time import time
+import logging
+import sqlite3
+import threading
+from time import sleep, time
+
+from ledger_store import LedgerStore
+from mempool import Mempool
+from merkle import merkle_path, merkle_root, tx_hashes
+from mining import DEFAULT_DIFFICULTY, Miner
+from mining import valid_proof as _valid_proof
+from records import Transaction
+
+log = logging.getLogger(__name__)
+
+# Fields covered by a block's hash; transactions are committed via merkle_root
+HEADER_FIELDS = ('index', 'timestamp', 'merkle_root', 'proof', 'previous_hash')
 
 class Blockchain:
-    def __init__(self):
-        self.chain = []
-        self.current_transactions = []
-        # Create genesis block
-        self.new_block(previous_hash='1', proof=100)
+    def __init__(self, difficulty=DEFAULT_DIFFICULTY, miner=None, path=':memory:',
+                 max_block_transactions=10000, flush_interval=None):
+        # Blocks and pending transactions live in the ledger store, not in memory
+        self.store = LedgerStore(path)
+        self.difficulty = difficulty
+        self.max_block_transactions = max_block_transactions
+        self.miner = miner or Miner(difficulty, workers=1)
+        self._mine_lock = threading.Lock()
+        # New transactions land in a striped mempool and are group-committed by
+        # flush(): on every call by default, or every flush_interval seconds.
+        # Only the interval mode gains from the stripes: by default every
+        # writer still waits on _flush_lock for the ledger commit.
+        self.mempool = Mempool()
+        self.flush_interval = flush_interval
+        self._flush_lock = threading.Lock()
+        # Create genesis block (unless another worker already has)
+        if self.store.tip() is None:
+            self.new_block(previous_hash='1', proof=100, expected_tip=0)
+        self._tip_index = self.store.tip()[0]
+        if flush_interval:
+            threading.Thread(target=self._flush_loop, daemon=True, name='mempool-flush').start()
     
-    def new_block(self, proof, previous_hash=None):
+    def new_block(self, proof, previous_hash=None, expected_tip=None):
         """Create a new block in the blockchain"""
-        block = {
-            'index': len(self.chain) + 1,
-            'timestamp': time(),
-            'transactions': self.current_transactions,
-            'proof': proof,
-            'previous_hash': previous_hash or self.hash(self.chain[-1]),
-        }
-        self.current_transactions = []
-        self.chain.append(block)
+        block = self.store.seal(proof, time(), merkle_root, self.hash,
+                                previous_hash=previous_hash, expected_tip=expected_tip,
+                                limit=self.max_block_transactions, difficulty=self.difficulty)
+        if block is not None:
+            self._tip_index = block['index']
         return block
     
     def new_transaction(self, farmer, crop, price, quantity, location):
-        """Add a new transaction to the current block"""
-        self.current_transactions.append({
-            'farmer': farmer,
-            'crop': crop,
-            'price': price,
-            'quantity': quantity,
-            'location': location,
-            'timestamp': time()
-        })
-        return self.last_block['index'] + 1
+        """Add a new transaction to the current block.
+
+        Fields are checked and coerced by Transaction before anything reaches
+        the mempool, so a bad request fails on its own (TypeError/ValueError).
+        """
+        transaction = Transaction(farmer, crop, price, quantity, location, time())
+        self.mempool.add((transaction, transaction.hash()))
+        if not self.flush_interval:
+            self.flush()
+        return self._tip_index + 1
+    
+    def flush(self, extra=()):
+        """Write everything in the mempool (then `extra` pairs) to the store as one batch.
+
+        Callers queue behind whoever is flushing; by the time they get the lock
+        their own transaction has been committed by an earlier batch or is
+        picked up by this one. If the store is unavailable (OperationalError)
+        the whole batch, `extra` included, goes back to the mempool for the
+        next flush before the error is raised.
+        """
+        with self._flush_lock:
+            drained = self.mempool.drain()
+            batch = drained + list(extra)
+            if not batch:
+                return 0
+            try:
+                self.store.append_transactions([tx for tx, _ in batch], [h for _, h in batch])
+            except sqlite3.OperationalError:
+                # Store unavailable (locked, disk): nothing was written, keep the batch for the next flush
+                self.mempool.requeue(batch)
+                raise
+            except Exception:
+                # A row the store cannot take: write the rest one by one and drop only that row
+                for position, (tx, leaf) in enumerate(batch):
+                    try:
+                        self.store.append_transactions([tx], [leaf])
+                    except sqlite3.OperationalError:
+                        self.mempool.requeue(batch[position:])
+                        raise
+                    except Exception as e:
+                        log.error('Dropped unstorable transaction %r: %s', tx, e)
+            return len(batch)
+    
+    def _flush_loop(self):
+        while True:
+            sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning('Mempool flush failed, retrying in %ss: %s', self.flush_interval, e)
+    
+    def pending_count(self):
+        """Transactions not yet sealed, including any still in the mempool"""
+        return self.store.pending_count() + len(self.mempool)
+    
+    def new_transactions(self, transactions):
+        """Add many already-validated transactions as one batch"""
+        timestamp = time()
+        batch = [Transaction(timestamp=timestamp, **tx) for tx in transactions]
+        self.flush(zip(batch, tx_hashes(tx.astuple() for tx in batch)))
+        return self._tip_index + 1
     
     @staticmethod
     def hash(block):
-        """Create a SHA-256 hash of a block"""
-        block_string = json.dumps(block, sort_keys=True).encode()
+        """Create a SHA-256 hash of a block header"""
+        header = {field: block[field] for field in HEADER_FIELDS}
+        block_string = json.dumps(header, sort_keys=True).encode()
         return hashlib.sha256(block_string).hexdigest()
     
     @property
     def last_block(self):
         """Return the last block in the chain"""
-        return self.chain[-1]
+        return self.store.get_block(self.store.tip()[0])
+    
+    @property
+    def chain(self):
+        """Every block, loaded from the store (prefer iter_blocks for large ledgers)"""
+        return list(self.store.iter_blocks())
+    
+    @property
+    def current_transactions(self):
+        """Transactions waiting to be sealed into the next block"""
+        self.flush()
+        return self.store.pending()
+    
+    def __len__(self):
+        return self.store.block_count()
+    
+    def iter_blocks(self, start=1, records=False):
+        return self.store.iter_blocks(start, records=records)
+    
+    def block_hash(self, index):
+        """Stored digest of a sealed block"""
+        return self.store.block_hash(index)
+    
+    def get_all_transactions(self, records=False):
+        """Get all transactions from all blocks"""
+        return self.store.sealed_transactions(records)
+    
+    def merkle_proof(self, block_index, tx_index):
+        """Inclusion proof for a transaction: its leaf hash and Merkle path to the block root"""
+        leaves = self.store.tx_leaves(block_index)
+        block = self.store.get_block(block_index)
+        return {
+            'block_index': block_index,
+            'block_hash': self.block_hash(block_index),
+            'merkle_root': block['merkle_root'],
+            'tx_index': tx_index,
+            'tx_hash': leaves[tx_index],
+            'transaction': block['transactions'][tx_index],
+            'path': merkle_path(leaves, tx_index)
+        }
     
     def proof_of_work(self, last_proof):
-        """Simple Proof of Work algorithm"""
-        proof = 0
-        while self.valid_proof(last_proof, proof) is False:
-            proof += 1
-        return proof
+        """Find the smallest proof for last_proof at this chain's difficulty"""
+        return self.miner.proof_of_work(last_proof)
+    
+    def mine(self):
+        """Seal pending transactions (up to max_block_transactions) into a new block; None if nothing is pending"""
+        with self._mine_lock:
+            self.flush()
+            while self.store.pending_count():
+                tip_index, tip_proof, _ = self.store.tip()
+                proof = self.proof_of_work(tip_proof)
+                # Another worker may have sealed a block meanwhile; mine on the new tip
+                block = self.new_block(proof, expected_tip=tip_index)
+                if block is not None:
+                    return block
+            return None
     
     @staticmethod
-    def valid_proof(last_proof, proof):
+    def valid_proof(last_proof, proof, difficulty=DEFAULT_DIFFICULTY):
         """Validate the proof"""
-        guess = f'{last_proof}{proof}'.encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:4] == "0000"
\ No newline at end of file
+        return _valid_proof(last_proof, proof, difficulty)
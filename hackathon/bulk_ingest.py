@@ -0,0 +1,109 @@
+# bulk_ingest.py - Column-wise validation for bulk transaction uploads
+
+import csv
+import io
+
+import numpy as np
+
+from records import TEXT_TYPES, text_type_error
+
+# Text columns and the default used when a row leaves them blank (as /api/add-transaction does)
+TEXT_FIELDS = {'farmer': 'Unknown Farmer', 'crop': 'Unknown Crop', 'location': 'Unknown'}
+NUMERIC_FIELDS = ('price', 'quantity')
+MAX_TEXT_LENGTH = 200
+
+
+def rows_from_csv(text):
+    """Parse CSV with a header row into a list of dicts"""
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def _numeric_column(values):
+    """Convert a column to float64, NaN where a value is missing or not a number"""
+    try:
+        # Fast path: one C-level conversion for a clean column
+        column = np.array(values, dtype=np.float64)
+        if column.ndim == 1:
+            return column
+    except (TypeError, ValueError):
+        pass
+
+    column = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            column[i] = float(value)
+        except (TypeError, ValueError):
+            column[i] = np.nan
+    return column
+
+
+def _text_column(values, default):
+    """Stripped strings (default where blank); values Transaction would refuse are left as None"""
+    column = []
+    for v in values:
+        if v is None:
+            column.append(default)
+        elif isinstance(v, TEXT_TYPES):
+            column.append(str(v).strip() or default)
+        else:
+            column.append(None)
+    return column
+
+
+def validate_rows(rows):
+    """Validate all rows column by column.
+
+    Returns (valid, errors): `valid` is a list of (row_number, fields) ready for
+    Blockchain.new_transactions, `errors` a list of {'row', 'error'} dicts.
+    """
+    is_dict = np.fromiter((isinstance(r, dict) for r in rows), dtype=bool, count=len(rows))
+    rows = [r if isinstance(r, dict) else {} for r in rows]
+
+    numeric = {f: _numeric_column([r.get(f) for r in rows]) for f in NUMERIC_FIELDS}
+    text = {f: _text_column([r.get(f) for r in rows], d) for f, d in TEXT_FIELDS.items()}
+
+    problems = {
+        'row must be an object': ~is_dict,
+        'price must be a positive number': ~(numeric['price'] > 0) | ~np.isfinite(numeric['price']),
+        'quantity must be a positive number': ~(numeric['quantity'] > 0) | ~np.isfinite(numeric['quantity']),
+    }
+    # Same rule and message as /api/add-transaction; the message names the type, so it is per row
+    type_errors = {}
+    for field, column in text.items():
+        for i in (i for i, v in enumerate(column) if v is None):
+            type_errors.setdefault(i, []).append(text_type_error(field, rows[i][field]))
+        lengths = np.fromiter((len(v or '') for v in column), dtype=np.int64, count=len(column))
+        problems[f'{field} longer than {MAX_TEXT_LENGTH} characters'] = lengths > MAX_TEXT_LENGTH
+
+    invalid = np.zeros(len(rows), dtype=bool)
+    for mask in problems.values():
+        invalid |= mask
+    invalid[list(type_errors)] = True
+
+    errors = []
+    for i in np.flatnonzero(invalid).tolist():
+        messages = [message for message, mask in problems.items() if mask[i]]
+        errors.append({'row': i, 'error': '; '.join(messages + type_errors.get(i, []))})
+
+    price = numeric['price'].tolist()
+    quantity = numeric['quantity'].tolist()
+    valid = []
+    first_seen = {}
+    for i in np.flatnonzero(~invalid).tolist():
+        fields = {
+            'farmer': text['farmer'][i],
+            'crop': text['crop'][i],
+            'price': price[i],
+            'quantity': quantity[i],
+            'location': text['location'][i],
+        }
+        # The batch shares one timestamp, so a repeated row would repeat a
+        # Merkle leaf, which validation rejects
+        key = tuple(fields.values())
+        if key in first_seen:
+            errors.append({'row': i, 'error': f'duplicate of row {first_seen[key]}'})
+            continue
+        first_seen[key] = i
+        valid.append((i, fields))
+    errors.sort(key=lambda e: e['row'])
+    return valid, errors
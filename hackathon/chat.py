@@ -0,0 +1,157 @@
+# chat.py - Keyword intents for /api/chat across en/ta/ml/te
+#
+# Every intent keyword, in every language, is listed once at startup in
+# priority order (crops, then topics); a message is searched for each in turn
+# and the first hit is its intent. Text is NFKC-normalised and case-folded,
+# and zero-width joiners are dropped, so the different ways phones encode the
+# same Indic word match alike. Crop answers are generated from CROP_DATABASE.
+
+import re
+import unicodedata
+
+LANGUAGES = ('en', 'ta', 'ml', 'te')
+DEFAULT_LANG = 'en'
+
+_ZERO_WIDTH = re.compile('[\u200b\u200c\u200d\ufeff]')
+# Malayalam/Telugu drop the virama when a suffix is added (കാരറ്റ് -> കാരറ്റിന്),
+# so keywords are matched without a trailing one. Tamil keeps its pulli.
+_SUFFIX_VIRAMAS = '\u0d4d\u0c4d'
+
+SEASON_NAMES = {
+    'en': {'kharif': 'Kharif', 'rabi': 'Rabi', 'zaid': 'Zaid'},
+    'ta': {'kharif': 'காரீப்', 'rabi': 'ரபி', 'zaid': 'சைத்'},
+    'ml': {'kharif': 'ഖാരിഫ്', 'rabi': 'റാബി', 'zaid': 'സായിദ്'},
+    'te': {'kharif': 'ఖరీఫ్', 'rabi': 'రబీ', 'zaid': 'జైద్'},
+}
+SEASON_JOINER = {'en': ' or ', 'ta': ' அல்லது ', 'ml': ' അല്ലെങ്കിൽ ', 'te': ' లేదా '}
+
+CROP_FACT = {
+    'en': '{name} grows best in soil with pH {ph_min}-{ph_max}. Plant in {seasons} season. '
+          'It needs {temp_min}-{temp_max}°C temperature and takes {days} days to harvest.',
+    'ta': '{name} {ph_min}-{ph_max} pH உள்ள மண்ணில் நன்றாக வளரும். {seasons} பருவத்தில் நடவும். '
+          '{temp_min}-{temp_max}°C வெப்பநிலை தேவை. அறுவடைக்கு {days} நாட்கள் ஆகும்.',
+    'ml': '{name} {ph_min}-{ph_max} pH ഉള്ള മണ്ണിൽ നന്നായി വളരുന്നു. {seasons} സീസണിൽ നടുക. '
+          '{temp_min}-{temp_max}°C താപനില ആവശ്യമാണ്. വിളവെടുപ്പിന് {days} ദിവസം.',
+    'te': '{name} {ph_min}-{ph_max} pH ఉన్న నేలలో బాగా పెరుగుతుంది. {seasons} సీజన్‌లో నాటండి. '
+          '{temp_min}-{temp_max}°C ఉష్ణోగ్రత అవసరం. కోతకు {days} రోజులు పడుతుంది.',
+}
+
+# Topic intents: keywords per language and the reply in each language
+TOPICS = {
+    'weather': {
+        'keywords': {'en': ['weather', 'rain', 'forecast', 'temperature'],
+                     'ta': ['வானிலை', 'மழை'], 'ml': ['കാലാവസ്ഥ', 'മഴ'], 'te': ['వాతావరణ', 'వర్ష']},
+        'reply': {
+            'en': 'Check our weather section for real-time updates! We use live data from Open-Meteo API.',
+            'ta': 'நேரடி வானிலை தகவலுக்கு எங்கள் வானிலை பகுதியைப் பாருங்கள்! Open-Meteo API இலிருந்து நேரடி தரவைப் பயன்படுத்துகிறோம்.',
+            'ml': 'തത്സമയ കാലാവസ്ഥാ വിവരങ്ങൾക്ക് ഞങ്ങളുടെ കാലാവസ്ഥ വിഭാഗം കാണുക! Open-Meteo API-യിൽ നിന്നുള്ള തത്സമയ ഡാറ്റയാണ് ഉപയോഗിക്കുന്നത്.',
+            'te': 'తాజా వాతావరణ సమాచారం కోసం మా వాతావరణ విభాగాన్ని చూడండి! Open-Meteo API నుండి ప్రత్యక్ష డేటాను ఉపయోగిస్తాము.',
+        },
+    },
+    'price': {
+        'keywords': {'en': ['price', 'market', 'mandi'],
+                     'ta': ['விலை', 'சந்தை'], 'ml': ['വില', 'വിപണി'], 'te': ['ధర', 'మార్కెట్']},
+        'reply': {
+            'en': 'Current market prices are available in the Market Guru section. Prices update regularly based on mandi data.',
+            'ta': 'தற்போதைய சந்தை விலைகள் Market Guru பகுதியில் உள்ளன. மண்டி தரவின் அடிப்படையில் விலைகள் புதுப்பிக்கப்படுகின்றன.',
+            'ml': 'നിലവിലെ വിപണി വിലകൾ Market Guru വിഭാഗത്തിൽ ലഭ്യമാണ്. മണ്ടി ഡാറ്റ അനുസരിച്ച് വിലകൾ പുതുക്കുന്നു.',
+            'te': 'ప్రస్తుత మార్కెట్ ధరలు Market Guru విభాగంలో ఉన్నాయి. మండి డేటా ఆధారంగా ధరలు నవీకరించబడతాయి.',
+        },
+    },
+    'soil': {
+        'keywords': {'en': ['soil', 'fertilizer', 'fertiliser'],
+                     'ta': ['மண்'], 'ml': ['മണ്ണ്'], 'te': ['నేల', 'మట్టి']},
+        'reply': {
+            'en': 'Soil health is crucial! Use our Soil Doctor feature to analyze your soil pH and nutrients.',
+            'ta': 'மண் ஆரோக்கியம் மிக முக்கியம்! உங்கள் மண்ணின் pH மற்றும் சத்துக்களை அறிய Soil Doctor பகுதியைப் பயன்படுத்துங்கள்.',
+            'ml': 'മണ്ണിന്റെ ആരോഗ്യം വളരെ പ്രധാനമാണ്! മണ്ണിന്റെ pH-ഉം പോഷകങ്ങളും അറിയാൻ Soil Doctor ഉപയോഗിക്കുക.',
+            'te': 'నేల ఆరోగ్యం చాలా ముఖ్యం! మీ నేల pH మరియు పోషకాలను తెలుసుకోవడానికి Soil Doctor ను ఉపయోగించండి.',
+        },
+    },
+}
+
+DEFAULT_REPLY = {
+    'en': 'I can help with crop advice, weather, prices, soil analysis, and farming tips! What would you like to know?',
+    'ta': 'நான் பயிர் ஆலோசனை, வானிலை, விலைகள், மண் பகுப்பாய்வு மற்றும் விவசாய குறிப்புகளுக்கு உதவ முடியும்!',
+    'ml': 'വിള ഉപദേശം, കാലാവസ്ഥ, വിലകൾ, മണ്ണ് വിശകലനം എന്നിവയിൽ എനിക്ക് സഹായിക്കാനാകും!',
+    'te': 'పంట సలహా, వాతావరణం, ధరలు, నేల విశ్లేషణ మరియు వ్యవసాయ చిట్కాలతో నేను సహాయపడగలను!',
+}
+
+
+def normalize(text):
+    """NFKC, case-folded, without zero-width characters"""
+    if text.isascii():
+        # Already NFKC, and lower() is casefold() for ASCII
+        return text.lower()
+    return _ZERO_WIDTH.sub('', unicodedata.normalize('NFKC', text).casefold())
+
+
+def _keyword(text):
+    return normalize(text).rstrip(_SUFFIX_VIRAMAS)
+
+
+class KeywordIndex:
+    """Substring tests over every keyword in priority order, stopping at the first hit.
+
+    Latin-script keywords must start a word ('rain' is not in 'grain'). ASCII
+    text can only contain the ASCII keywords, so only those are tried on it.
+    """
+
+    def __init__(self, keywords):
+        """keywords maps keyword -> value; the lowest value found in a text wins"""
+        self.keywords = keywords
+        ordered = sorted(keywords.items(), key=lambda item: item[1])
+        self._all = [(word, value, word[0].isascii() and word[0].isalpha()) for word, value in ordered]
+        self._ascii = [entry for entry in self._all if entry[0].isascii()]
+
+    def first(self, text):
+        """Lowest value among the keywords in (normalised) text, or None"""
+        for word, value, word_start in self._ascii if text.isascii() else self._all:
+            start = text.find(word)
+            while start != -1:
+                if not (word_start and start and text[start - 1].isalpha()):
+                    return value
+                start = text.find(word, start + 1)
+        return None
+
+
+class ChatIndex:
+    def __init__(self, crop_database):
+        # Intents in priority order: crops first, then topics
+        self.replies = {}
+        keywords = {}
+        for priority, (crop_id, crop) in enumerate(crop_database.items()):
+            intent = (priority, crop_id)
+            self.replies[intent] = {lang: self._crop_fact(crop, lang) for lang in LANGUAGES}
+            names = [crop_id, crop['name']] + [crop.get(f'name_{lang}') for lang in LANGUAGES[1:]]
+            for name in filter(None, names):
+                keywords.setdefault(_keyword(name), intent)
+        for priority, (topic, spec) in enumerate(TOPICS.items(), len(crop_database)):
+            intent = (priority, topic)
+            self.replies[intent] = spec['reply']
+            for words in spec['keywords'].values():
+                for word in words:
+                    keywords.setdefault(_keyword(word), intent)
+        self.index = KeywordIndex(keywords)
+
+    @staticmethod
+    def _crop_fact(crop, lang):
+        names = SEASON_NAMES[lang]
+        seasons = SEASON_JOINER[lang].join(names.get(s, s.title()) for s in crop['season'])
+        name = crop['name'] if lang == 'en' else crop.get(f'name_{lang}', crop['name'])
+        return CROP_FACT[lang].format(
+            name=name, ph_min=crop['ph_min'], ph_max=crop['ph_max'], seasons=seasons,
+            temp_min=crop['temp_min'], temp_max=crop['temp_max'], days=crop['days_to_harvest'])
+
+    def intent(self, message):
+        """Highest-priority intent mentioned in message, or None"""
+        return self.index.first(normalize(message))
+
+    def reply(self, message, lang=DEFAULT_LANG):
+        """Answer in lang (unknown languages get English)"""
+        if lang not in LANGUAGES:
+            lang = DEFAULT_LANG
+        intent = self.intent(message)
+        if intent is None:
+            return DEFAULT_REPLY[lang]
+        return self.replies[intent][lang]
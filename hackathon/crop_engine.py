@@ -0,0 +1,75 @@
+# crop_engine.py - Vectorized crop scoring over a columnar view of CROP_DATABASE
+
+import numpy as np
+
+
+class CropTable:
+    """CROP_DATABASE compiled into NumPy columns, one row per crop"""
+
+    def __init__(self, crop_database):
+        crops = list(crop_database.values())
+        self.ids = list(crop_database)
+        self.index = {crop_id: i for i, crop_id in enumerate(self.ids)}
+
+        def column(key, dtype=np.float64):
+            return np.array([crop[key] for crop in crops], dtype=dtype)
+
+        self.ph_min = column('ph_min')
+        self.ph_max = column('ph_max')
+        self.temp_min = column('temp_min')
+        self.temp_max = column('temp_max')
+        self.rain_min = column('rain_min')
+        self.rain_max = column('rain_max')
+        self.days_to_harvest = column('days_to_harvest', np.int32)
+
+        seasons = sorted({season for crop in crops for season in crop['season']})
+        self.season_bits = {season: 1 << i for i, season in enumerate(seasons)}
+        self.season_mask = np.array(
+            [sum(self.season_bits[s] for s in set(crop['season'])) for crop in crops],
+            dtype=np.uint32
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def season_bit(self, season):
+        """Bit for a season name; unknown seasons match no crop"""
+        return self.season_bits.get(season, 0)
+
+    def score(self, ph, temp, season, rain=None):
+        """Score every crop for N plots in one pass.
+
+        ph, temp and season (names) are scalars or length-N sequences; rain is
+        optional seasonal rainfall in mm (NaN = unknown, not penalised).
+        Returns (scores, in_season), both shaped (N, len(self)).
+        """
+        ph = np.atleast_1d(np.asarray(ph, dtype=np.float64))[:, None]
+        temp = np.atleast_1d(np.asarray(temp, dtype=np.float64))[:, None]
+        if isinstance(season, str):
+            season = [season]
+        bits = np.array([self.season_bit(s) for s in season], dtype=np.uint32)[:, None]
+
+        scores = np.full(np.broadcast_shapes(ph.shape, temp.shape, bits.shape, (1, len(self))),
+                         100, dtype=np.int32)
+        scores -= 15 * ((ph < self.ph_min) | (ph > self.ph_max))
+        scores -= 10 * ((temp < self.temp_min) | (temp > self.temp_max))
+        if rain is not None:
+            rain = np.atleast_1d(np.asarray(rain, dtype=np.float64))[:, None]
+            scores -= 10 * ((rain < self.rain_min) | (rain > self.rain_max))
+        np.clip(scores, 40, 99, out=scores)
+
+        in_season = (self.season_mask & bits) != 0
+        return scores, np.broadcast_to(in_season, scores.shape)
+
+    def score_plots(self, plots):
+        """Score a batch of (ph, temp, rain, season) tuples"""
+        ph, temp, rain, season = zip(*plots)
+        rain = [np.nan if r is None else r for r in rain]
+        return self.score(ph, temp, season, rain=rain)
+
+    @staticmethod
+    def ranked(scores, in_season):
+        """Row indices of in-season crops, best score first (ties keep catalogue order)"""
+        candidates = np.flatnonzero(in_season)
+        order = np.argsort(-scores[candidates], kind='stable')
+        return candidates[order]
@@ -0,0 +1,147 @@
+# http_client.py - Pooled keep-alive HTTP client with retries and per-host circuit breakers
+
+import random
+import threading
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Failures worth another attempt; any other error still counts against the breaker
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.HTTPError)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while a host's breaker is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Return True if a request may go out; half-open lets a single trial through"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = monotonic()
+
+
+class HTTPClient:
+    def __init__(self, connect_timeout=3.05, read_timeout=5, retries=2,
+                 backoff=0.2, max_backoff=2.0, pool_size=20,
+                 failure_threshold=5, reset_timeout=30):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        # One session = one keep-alive connection pool per host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        """Return the circuit breaker for a host, creating it on first use"""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def get(self, url, params=None, timeout=None, retries=None, deadline=None):
+        """GET url with bounded retries; raises on connection errors and non-2xx replies.
+
+        `deadline` caps the whole call, retries and backoff included, in
+        seconds: an attempt only starts while time remains and its read
+        timeout is what is left, so the call cannot outlive it.
+        """
+        retries = self.retries if retries is None else retries
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        deadline_at = None if deadline is None else monotonic() + deadline
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f'Circuit open for {host}')
+            attempt_timeout = timeout or self.timeout
+            if deadline_at is not None:
+                remaining = max(deadline_at - monotonic(), 0.001)
+                attempt_timeout = (min(attempt_timeout[0], remaining), min(attempt_timeout[1], remaining))
+            try:
+                response = self.session.get(url, params=params, timeout=attempt_timeout)
+                if response.status_code in RETRY_STATUSES:
+                    response.raise_for_status()
+            except TRANSIENT_ERRORS:
+                breaker.record_failure()
+                if attempt >= retries:
+                    raise
+                pause = self._backoff(attempt)
+                if deadline_at is not None and monotonic() + pause >= deadline_at:
+                    raise
+                sleep(pause)
+                attempt += 1
+                continue
+            except BaseException:
+                # e.g. ChunkedEncodingError, TooManyRedirects: no retry, but a
+                # half-open trial must still be closed out or the host stays refused
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+            response.raise_for_status()
+            return response
+
+    def get_json(self, url, params=None, timeout=None, retries=None, deadline=None):
+        return self.get(url, params=params, timeout=timeout, retries=retries, deadline=deadline).json()
+
+    def stats(self):
+        """Return breaker state and consecutive failures per host"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            host: {'state': b.state, 'failures': b.failures}
+            for host, b in breakers.items()
+        }
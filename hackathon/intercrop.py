@@ -0,0 +1,188 @@
+# intercrop.py - Companion-planting graph and multi-crop plot planning
+#
+# CROP_DATABASE's companion lists are compiled once into bitsets (one Python
+# int per crop, bit j = crop j). Relations are made symmetric: two crops are
+# companions if either lists the other, and incompatible if either lists the
+# other as a bad companion. Planning a plot is then a maximum-weight clique
+# search over the compatibility graph, done with bitset branch and bound: a
+# greedy plan seeds the bound, and the search stops at a deadline with the
+# best plan so far (reported as not proven optimal).
+
+from time import monotonic
+
+# Score added per companion pair in a plan (crop weights are match scores, 40-99)
+COMPANION_BONUS = 10
+
+
+# int.bit_count() on Python 3.10+
+_popcount = getattr(int, 'bit_count', None) or (lambda mask: bin(mask).count('1'))
+
+
+def _bits(indices):
+    mask = 0
+    for i in indices:
+        mask |= 1 << i
+    return mask
+
+
+def _members(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class CompanionGraph:
+    def __init__(self, crop_database):
+        self.ids = list(crop_database)
+        self.index = {crop_id: i for i, crop_id in enumerate(self.ids)}
+        n = len(self.ids)
+
+        # Directional lists as each crop declares them (unknown crops dropped)
+        self.declared_good = {c: [o for o in crop['companions'] if o in self.index]
+                              for c, crop in crop_database.items()}
+        self.declared_bad = {c: [o for o in crop['bad_companions'] if o in self.index]
+                             for c, crop in crop_database.items()}
+
+        self.good = [0] * n
+        self.bad = [0] * n
+        for crop_id, i in self.index.items():
+            for other in self.declared_good[crop_id]:
+                j = self.index[other]
+                self.good[i] |= 1 << j
+                self.good[j] |= 1 << i
+            for other in self.declared_bad[crop_id]:
+                j = self.index[other]
+                self.bad[i] |= 1 << j
+                self.bad[j] |= 1 << i
+        everyone = (1 << n) - 1
+        self.compatible = [everyone & ~self.bad[i] & ~(1 << i) for i in range(n)]
+        # A pair listed both ways (good by one, bad by the other) is not a companion
+        self.companion = [self.good[i] & self.compatible[i] for i in range(n)]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def plan(self, weights, k, required=(), strict=False, bonus=COMPANION_BONUS, budget=None):
+        """Best set of k mutually compatible crops.
+
+        weights maps crop id -> value of growing it here; crops without a
+        positive weight are left out unless required. strict=True only allows
+        sets where every pair is a declared companion. The score is the sum of
+        weights plus `bonus` per companion pair. The search stops after
+        `budget` seconds if given. Returns (crop ids, score, optimal), or None
+        if no such set exists.
+        """
+        w = [0.0] * len(self.ids)
+        for crop_id, value in weights.items():
+            if crop_id in self.index:
+                w[self.index[crop_id]] = float(value)
+        adjacency = self.companion if strict else self.compatible
+
+        clique = 0
+        for crop_id in required:
+            i = self.index[crop_id]
+            if clique & ~adjacency[i] & ~(1 << i):
+                return None
+            clique |= 1 << i
+        if _popcount(clique) > k:
+            return None
+
+        candidates = _bits(i for i in range(len(w)) if w[i] > 0) & ~clique
+        for i in _members(clique):
+            candidates &= adjacency[i]
+        score = sum(w[i] for i in _members(clique)) + bonus * sum(
+            _popcount(self.good[i] & clique) for i in _members(clique)) / 2
+
+        search = _Search(self.good, w, adjacency, bonus, candidates,
+                         None if budget is None else monotonic() + budget)
+        search.greedy(clique, score, candidates, k - _popcount(clique))
+        search.expand(clique, score, candidates, k - _popcount(clique))
+        if search.best is None:
+            return None
+        members = sorted(_members(search.best), key=lambda i: -w[i])
+        return [self.ids[i] for i in members], search.best_score, not search.timed_out
+
+
+class _Search:
+    """State of one branch-and-bound plan search"""
+
+    def __init__(self, good, w, adjacency, bonus, candidates, deadline):
+        self.good = good
+        self.w = w
+        self.adjacency = adjacency
+        self.bonus = bonus
+        self.deadline = deadline
+        # Candidates by weight, best first: the last pick scans this and stops early
+        self.by_weight = sorted(_members(candidates), key=lambda i: -w[i])
+        self.best = None
+        self.best_score = float('-inf')
+        self.timed_out = False
+        self.nodes = 0
+
+    def gain(self, v, clique):
+        """What adding v to clique is worth: its weight plus its new companion pairs"""
+        return self.w[v] + self.bonus * _popcount(self.good[v] & clique)
+
+    def record(self, clique, score):
+        if score > self.best_score:
+            self.best, self.best_score = clique, score
+
+    def greedy(self, clique, score, candidates, remaining):
+        """Seed the bound by repeatedly adding the best immediate gain"""
+        while remaining:
+            if not candidates:
+                return
+            v = max(_members(candidates), key=lambda u: self.gain(u, clique))
+            score += self.gain(v, clique)
+            clique |= 1 << v
+            candidates &= self.adjacency[v]
+            remaining -= 1
+        self.record(clique, score)
+
+    def last_pick(self, clique, score, candidates):
+        """Complete the clique with its single best candidate"""
+        most = self.bonus * _popcount(clique)
+        pick, best_gain = None, float('-inf')
+        for v in self.by_weight:
+            # No later candidate can beat best_gain, even with every companion bonus
+            if self.w[v] + most <= best_gain:
+                break
+            if candidates >> v & 1:
+                gain = self.gain(v, clique)
+                if gain > best_gain:
+                    pick, best_gain = v, gain
+        if pick is not None:
+            self.record(clique | 1 << pick, score + best_gain)
+
+    def expand(self, clique, score, candidates, remaining):
+        if remaining == 0:
+            self.record(clique, score)
+            return
+        if remaining == 1:
+            self.last_pick(clique, score, candidates)
+            return
+        if _popcount(candidates) < remaining:
+            return
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes % 64 and monotonic() > self.deadline:
+            self.timed_out = True
+        if self.timed_out:
+            return
+
+        # Optimistic gain of each candidate: its weight, its companions already
+        # in the clique, and half a bonus for each companion it could still meet
+        half = self.bonus / 2
+        gains = {v: self.gain(v, clique) + half * min(remaining - 1, _popcount(self.good[v] & candidates))
+                 for v in _members(candidates)}
+        order = sorted(gains, key=gains.get, reverse=True)
+        later = candidates
+        for position, v in enumerate(order):
+            # Only v and the candidates after it remain, so the bound tightens as v advances
+            if len(order) - position < remaining:
+                return
+            if score + sum(gains[u] for u in order[position:position + remaining]) <= self.best_score:
+                return
+            later &= ~(1 << v)
+            self.expand(clique | 1 << v, score + self.gain(v, clique), later & self.adjacency[v],
+                        remaining - 1)
@@ -0,0 +1,325 @@
+# ledger_store.py - Append-only SQLite (WAL) storage for the blockchain ledger
+#
+# Every gunicorn worker opens the same database file: SQLite's locking
+# serialises appends across processes and WAL lets readers run alongside a
+# writer. With synchronous=NORMAL commits are not fsynced individually; the
+# WAL is fsynced in batches at each checkpoint. Opening the file only replays
+# the WAL written since the last checkpoint, so startup time and memory do not
+# grow with the ledger.
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from records import Block, Transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    idx INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    merkle_root TEXT NOT NULL,
+    proof INTEGER NOT NULL,
+    previous_hash TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    difficulty INTEGER
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    block_idx INTEGER,
+    position INTEGER,
+    farmer TEXT,
+    crop TEXT,
+    price REAL,
+    quantity REAL,
+    location TEXT,
+    timestamp REAL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tx_by_block ON transactions (block_idx, position);
+CREATE INDEX IF NOT EXISTS tx_by_farmer ON transactions (farmer, id);
+CREATE INDEX IF NOT EXISTS tx_by_crop ON transactions (crop, id);
+CREATE INDEX IF NOT EXISTS tx_by_location ON transactions (location, id);
+CREATE INDEX IF NOT EXISTS tx_by_time ON transactions (timestamp);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+-- Sealed-transaction counts per indexed value, kept current by trigger
+CREATE TABLE IF NOT EXISTS tx_counts (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS tx_count_on_seal
+AFTER UPDATE OF block_idx ON transactions
+WHEN OLD.block_idx IS NULL AND NEW.block_idx IS NOT NULL
+BEGIN
+    INSERT INTO tx_counts VALUES ('all', '', 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+    INSERT INTO tx_counts VALUES ('farmer', COALESCE(NEW.farmer, ''), 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+    INSERT INTO tx_counts VALUES ('crop', COALESCE(NEW.crop, ''), 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+    INSERT INTO tx_counts VALUES ('location', COALESCE(NEW.location, ''), 1)
+        ON CONFLICT DO UPDATE SET n = n + 1;
+END;
+"""
+
+# Filters that can be answered from tx_counts without scanning
+COUNTED_DIMENSIONS = ('farmer', 'crop', 'location')
+
+TX_FIELDS = ('farmer', 'crop', 'price', 'quantity', 'location', 'timestamp')
+TX_COLUMNS = ', '.join(TX_FIELDS)
+
+BLOCK_COLUMNS = 'idx, timestamp, merkle_root, proof, previous_hash'
+
+
+def _tx(*row):
+    return dict(zip(TX_FIELDS, row))
+
+
+class LedgerStore:
+    def __init__(self, path=':memory:', synchronous='NORMAL'):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA synchronous={synchronous}')
+        self._conn.executescript(SCHEMA)
+        self._add_difficulty_column()
+        self._backfill_counts()
+
+    def _add_difficulty_column(self):
+        """Ledgers written before blocks recorded their difficulty get the column (NULL for old blocks)"""
+        with self.write() as conn:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(blocks)')]
+            if 'difficulty' not in columns:
+                conn.execute('ALTER TABLE blocks ADD COLUMN difficulty INTEGER')
+
+    def _backfill_counts(self):
+        """Populate tx_counts for ledgers written before it existed"""
+        with self.write() as conn:
+            if conn.execute('SELECT 1 FROM tx_counts LIMIT 1').fetchone():
+                return
+            conn.execute("INSERT INTO tx_counts SELECT 'all', '', COUNT(*) FROM transactions "
+                         "WHERE block_idx IS NOT NULL HAVING COUNT(*) > 0")
+            for dimension in COUNTED_DIMENSIONS:
+                conn.execute(f"INSERT INTO tx_counts SELECT '{dimension}', COALESCE({dimension}, ''), "
+                             f"COUNT(*) FROM transactions WHERE block_idx IS NOT NULL "
+                             f"GROUP BY COALESCE({dimension}, '')")
+
+    @contextmanager
+    def write(self):
+        """One write transaction; takes SQLite's write lock up front"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_meta(self, key):
+        rows = self.query('SELECT value FROM meta WHERE key = ?', (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key, value):
+        with self.write() as conn:
+            conn.execute('INSERT INTO meta VALUES (?, ?) ON CONFLICT DO UPDATE SET value = excluded.value',
+                         (key, value))
+
+    def delete_meta(self, key):
+        with self.write() as conn:
+            conn.execute('DELETE FROM meta WHERE key = ?', (key,))
+
+    # -- blocks --
+
+    def tip(self):
+        """(index, proof, hash) of the last block, or None for an empty ledger"""
+        rows = self.query('SELECT idx, proof, hash FROM blocks ORDER BY idx DESC LIMIT 1')
+        return rows[0] if rows else None
+
+    def block_count(self):
+        return self.query('SELECT COUNT(*) FROM blocks')[0][0]
+
+    @staticmethod
+    def _block(index, timestamp, merkle_root, proof, previous_hash, transactions):
+        return {
+            'index': index,
+            'timestamp': timestamp,
+            'transactions': transactions,
+            'merkle_root': merkle_root,
+            'proof': proof,
+            'previous_hash': previous_hash,
+        }
+
+    def get_block(self, index):
+        rows = self.query(f'SELECT {BLOCK_COLUMNS} FROM blocks WHERE idx = ?', (index,))
+        if not rows:
+            return None
+        txs = self.query(f'SELECT {TX_COLUMNS} FROM transactions WHERE block_idx = ? '
+                         'ORDER BY position', (index,))
+        return self._block(*rows[0], [_tx(*t) for t in txs])
+
+    def iter_blocks(self, start=1, page=256, stop=None, records=False):
+        """Yield blocks in order (up to index `stop`), reading `page` blocks per query.
+
+        With records=True blocks come back as compact Block/Transaction records
+        instead of dicts, for callers that hold many of them at once.
+        """
+        make_tx, make_block = (Transaction, Block) if records else (_tx, self._block)
+        stop = -1 if stop is None else stop
+        while True:
+            rows = self.query(f'SELECT {BLOCK_COLUMNS} FROM blocks WHERE idx >= ? '
+                              'AND (? < 0 OR idx <= ?) ORDER BY idx LIMIT ?',
+                              (start, stop, stop, page))
+            if not rows:
+                return
+            last = rows[-1][0]
+            txs = {}
+            for t in self.query(f'SELECT block_idx, {TX_COLUMNS} FROM transactions '
+                                'WHERE block_idx BETWEEN ? AND ? ORDER BY block_idx, position',
+                                (start, last)):
+                txs.setdefault(t[0], []).append(make_tx(*t[1:]))
+            for row in rows:
+                yield make_block(*row, txs.get(row[0], []))
+            start = last + 1
+
+    def blocks_page(self, before=None, limit=50):
+        """Up to `limit` blocks with index < before (default: the tip), newest first"""
+        if before is None:
+            before = (self.tip() or (0,))[0] + 1
+        blocks = []
+        for block in self.iter_blocks(max(1, before - limit), page=limit):
+            if block['index'] >= before:
+                break
+            blocks.append(block)
+        return blocks[::-1]
+
+    def block_hash(self, index):
+        rows = self.query('SELECT hash FROM blocks WHERE idx = ?', (index,))
+        return rows[0][0] if rows else None
+
+    def tx_leaves(self, index):
+        """Leaf hashes of a sealed block, in Merkle order"""
+        return [r[0] for r in self.query(
+            'SELECT hash FROM transactions WHERE block_idx = ? ORDER BY position', (index,))]
+
+    def seal(self, proof, timestamp, merkle_root_fn, hash_fn,
+             previous_hash=None, expected_tip=None, limit=None, difficulty=None):
+        """Atomically turn the oldest `limit` (default: all) pending transactions into the next block.
+
+        `difficulty` is the one `proof` was mined at; it is stored with the
+        block so validation does not depend on the current setting.
+
+        Returns None (and writes nothing) if the tip is no longer expected_tip,
+        e.g. because another worker sealed a block while this one was mining.
+        """
+        with self.write() as conn:
+            tip = conn.execute('SELECT idx, hash FROM blocks ORDER BY idx DESC LIMIT 1').fetchone()
+            tip_index = tip[0] if tip else 0
+            if expected_tip is not None and tip_index != expected_tip:
+                return None
+
+            pending = conn.execute(f'SELECT id, hash, {TX_COLUMNS} FROM transactions '
+                                   'WHERE block_idx IS NULL ORDER BY id LIMIT ?',
+                                   (-1 if limit is None else limit,)).fetchall()
+            block = {
+                'index': tip_index + 1,
+                'timestamp': timestamp,
+                'transactions': [_tx(*row[2:]) for row in pending],
+                'merkle_root': merkle_root_fn([row[1] for row in pending]),
+                'proof': proof,
+                'previous_hash': previous_hash or tip[1],
+            }
+            conn.execute('INSERT INTO blocks (idx, timestamp, merkle_root, proof, previous_hash, hash, difficulty) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (block['index'], timestamp, block['merkle_root'], proof,
+                          block['previous_hash'], hash_fn(block), difficulty))
+            conn.executemany('UPDATE transactions SET block_idx = ?, position = ? WHERE id = ?',
+                             [(block['index'], pos, row[0]) for pos, row in enumerate(pending)])
+            return block
+
+    # -- transactions --
+
+    def append_transactions(self, transactions, leaf_hashes):
+        """Append many Transaction records in a single write transaction"""
+        with self.write() as conn:
+            conn.executemany(f'INSERT INTO transactions ({TX_COLUMNS}, hash) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (tx.astuple() + (leaf,) for tx, leaf in zip(transactions, leaf_hashes)))
+
+    def pending(self):
+        return [_tx(*r) for r in self.query(
+            f'SELECT {TX_COLUMNS} FROM transactions WHERE block_idx IS NULL ORDER BY id')]
+
+    def pending_count(self):
+        return self.query('SELECT COUNT(*) FROM transactions WHERE block_idx IS NULL')[0][0]
+
+    def sealed_transactions(self, records=False):
+        make_tx = Transaction if records else _tx
+        return [make_tx(*r) for r in self.query(
+            f'SELECT {TX_COLUMNS} FROM transactions WHERE block_idx IS NOT NULL '
+            'ORDER BY block_idx, position')]
+
+    def _tx_filter(self, status='sealed', farmer=None, crop=None, location=None,
+                   since=None, until=None):
+        clauses, params = [], []
+        if status == 'sealed':
+            clauses.append('block_idx IS NOT NULL')
+        elif status == 'pending':
+            clauses.append('block_idx IS NULL')
+        for column, value in (('farmer', farmer), ('crop', crop), ('location', location)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        return ' AND '.join(clauses) or '1', params
+
+    def transactions_page(self, cursor=None, limit=50, **filters):
+        """Matching transactions newest first, plus the cursor for the next page"""
+        where, params = self._tx_filter(**filters)
+        if cursor is not None:
+            where += ' AND id < ?'
+            params.append(cursor)
+        rows = self.query(f'SELECT id, block_idx, {TX_COLUMNS} FROM transactions '
+                          f'WHERE {where} ORDER BY id DESC LIMIT ?', params + [limit + 1])
+        page = []
+        for row in rows[:limit]:
+            tx = _tx(*row[2:])
+            tx['id'] = row[0]
+            tx['block_index'] = row[1]
+            page.append(tx)
+        next_cursor = page[-1]['id'] if len(rows) > limit else None
+        return page, next_cursor
+
+    def count_transactions(self, status='sealed', **filters):
+        """Number of matching transactions; O(1) for sealed rows filtered on at most one of farmer/crop/location"""
+        used = {k: v for k, v in filters.items() if v is not None}
+        # tx_counts files NULLs under '' too, so an empty value has to be counted like the page
+        if (status == 'sealed' and len(used) <= 1 and set(used) <= set(COUNTED_DIMENSIONS)
+                and '' not in used.values()):
+            dimension, value = next(iter(used.items()), ('all', ''))
+            rows = self.query('SELECT n FROM tx_counts WHERE dimension = ? AND value = ?',
+                              (dimension, value))
+            return rows[0][0] if rows else 0
+        where, params = self._tx_filter(status=status, **filters)
+        return self.query(f'SELECT COUNT(*) FROM transactions WHERE {where}', params)[0][0]
@@ -0,0 +1,138 @@
+# market.py - Daily mandi price series with precomputed rolling analytics
+#
+# Prices are loaded once into a (crops x days) matrix on a common daily
+# calendar. Rolling means, volatility and a least-squares trend are computed
+# for every crop at once with NumPy, and each crop's outlook is stored as a
+# ready quote, so lookups are a dict access.
+
+import csv
+from datetime import date
+
+import numpy as np
+
+# Fallback ₹/kg for crops with no price history, served as a flat series
+BASE_PRICES = {
+    'tomato': 35, 'onion': 28, 'potato': 18, 'brinjal': 25,
+    'chili': 45, 'carrot': 35, 'beans': 40, 'coriander': 60
+}
+DEFAULT_PRICE = 30
+
+WINDOWS = (7, 30)          # rolling means reported with each quote
+TREND_WINDOW = 30          # days of history behind the trend and volatility
+STABLE_BAND = 0.02         # weekly move below 2% of the price counts as stable
+MIN_PRICE = 5
+
+
+def _rolling_mean(matrix, window):
+    """Trailing mean along axis 1; the first window-1 days average what exists"""
+    sums = np.cumsum(matrix, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    counts = np.minimum(np.arange(1, matrix.shape[1] + 1), window)
+    return sums / counts
+
+
+def _forward_fill(matrix):
+    """Carry the last observed price over missing days (and the first one back)"""
+    observed = ~np.isnan(matrix)
+    idx = np.where(observed, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    first = observed.argmax(axis=1)
+    idx = np.maximum(idx, first[:, None])
+    return matrix[np.arange(matrix.shape[0])[:, None], idx]
+
+
+def _price(value):
+    return round(float(value), 2)
+
+
+class MarketPrices:
+    """Price history for a set of crops, with one precomputed quote per crop"""
+
+    def __init__(self, series, base_prices=BASE_PRICES):
+        """`series` maps crop -> list of (date, price); crops in base_prices without
+        history get a flat series at their base price"""
+        series = {crop: sorted(points) for crop, points in series.items() if points}
+        end = max((points[-1][0] for points in series.values()), default=date.today())
+        for crop, price in base_prices.items():
+            series.setdefault(crop, [(end, float(price))])
+
+        self.crops = list(series)
+        self._row = {crop: i for i, crop in enumerate(self.crops)}
+        start = min(points[0][0] for points in series.values())
+        self.start, self.end = start, end
+        self.days = (end - start).days + 1
+
+        matrix = np.full((len(self.crops), self.days), np.nan)
+        for i, crop in enumerate(self.crops):
+            offsets = [(d - start).days for d, _ in series[crop]]
+            matrix[i, offsets] = [p for _, p in series[crop]]
+        self.prices = _forward_fill(matrix)
+
+        self.rolling = {w: _rolling_mean(self.prices, w) for w in WINDOWS}
+
+        recent = self.prices[:, -TREND_WINDOW:]
+        x = np.arange(recent.shape[1], dtype=np.float64)
+        x -= x.mean()
+        denom = float(x @ x) or 1.0
+        # Least-squares slope in ₹/day over the trend window
+        self.slope = (recent - recent.mean(axis=1, keepdims=True)) @ x / denom
+        returns = np.diff(np.log(self.prices[:, -(TREND_WINDOW + 1):]), axis=1)
+        self.volatility = returns.std(axis=1) if returns.shape[1] else np.zeros(len(self.crops))
+
+        self._quotes = {crop: self._quote(i) for i, crop in enumerate(self.crops)}
+        self._default = {
+            'current': DEFAULT_PRICE, 'next_week': DEFAULT_PRICE, 'next_month': DEFAULT_PRICE,
+            'trend': 'stable', 'avg_7d': DEFAULT_PRICE, 'avg_30d': DEFAULT_PRICE,
+            'volatility': 0.0, 'as_of': None
+        }
+
+    @classmethod
+    def from_csv(cls, path, base_prices=BASE_PRICES):
+        """Load daily prices from a CSV with date (YYYY-MM-DD), crop and price (₹/kg) columns"""
+        series = {}
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    day = date.fromisoformat(row['date'].strip())
+                    crop = row['crop'].strip().lower()
+                    price = float(row['price'])
+                except (KeyError, ValueError, AttributeError, TypeError):
+                    continue
+                if price > 0:
+                    series.setdefault(crop, []).append((day, price))
+        return cls(series, base_prices)
+
+    def _quote(self, i):
+        current = self.prices[i, -1]
+        slope = self.slope[i]
+        if abs(slope * 7) < STABLE_BAND * current:
+            trend = 'stable'
+        else:
+            trend = 'up' if slope > 0 else 'down'
+        return {
+            'current': _price(current),
+            'next_week': _price(max(MIN_PRICE, current + slope * 7)),
+            'next_month': _price(max(MIN_PRICE, current + slope * 30)),
+            'trend': trend,
+            'avg_7d': _price(self.rolling[7][i, -1]),
+            'avg_30d': _price(self.rolling[30][i, -1]),
+            'volatility': round(float(self.volatility[i]), 4),
+            'as_of': self.end.isoformat()
+        }
+
+    def quote(self, crop):
+        """Current price, week/month outlook and rolling stats for a crop"""
+        return self._quotes.get(crop, self._default)
+
+    def history(self, crop, days=90):
+        """The last `days` daily prices and rolling means for a crop, oldest first"""
+        i = self._row.get(crop)
+        if i is None:
+            return None
+        days = max(1, days)
+        first = self.start.toordinal() + max(0, self.days - days)
+        return {
+            'start': date.fromordinal(first).isoformat(),
+            'prices': [_price(p) for p in self.prices[i, -days:]],
+            **{f'avg_{w}d': [_price(p) for p in self.rolling[w][i, -days:]] for w in WINDOWS}
+        }
@@ -0,0 +1,66 @@
+# mempool.py - Lock-striped pool of transactions waiting to be written to the ledger
+
+import heapq
+import itertools
+import threading
+
+
+class _Stripe:
+    __slots__ = ('items', 'lock')
+
+    def __init__(self):
+        self.items = []
+        self.lock = threading.Lock()
+
+
+class Mempool:
+    """Each thread appends to its own stripe, so writers do not share one lock.
+
+    drain() takes every stripe lock briefly and swaps the lists out, returning
+    all items in arrival order. Writers only run concurrently when nothing
+    serialises them further up: Blockchain flushes on every add unless it has
+    a flush_interval (see benchmarks/bench_mempool.py).
+    """
+
+    def __init__(self, stripes=16):
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        self._seq = itertools.count()
+        # requeue() numbers from below zero so returned items sort ahead of everything
+        self._front = itertools.count(-1, -1)
+        self._next_stripe = itertools.count()
+        self._local = threading.local()
+
+    def _stripe(self):
+        stripe = getattr(self._local, 'stripe', None)
+        if stripe is None:
+            stripe = self._local.stripe = self._stripes[next(self._next_stripe) % len(self._stripes)]
+        return stripe
+
+    def add(self, item):
+        stripe = self._stripe()
+        entry = (next(self._seq), item)
+        with stripe.lock:
+            stripe.items.append(entry)
+
+    def requeue(self, items):
+        """Put drained items back, ahead of anything added since, in their original order"""
+        entries = [(next(self._front), item) for item in reversed(items)][::-1]
+        stripe = self._stripes[0]
+        with stripe.lock:
+            stripe.items[:0] = entries
+
+    def drain(self):
+        """Atomically remove and return every pending item, oldest first"""
+        for stripe in self._stripes:
+            stripe.lock.acquire()
+        try:
+            batches = [stripe.items for stripe in self._stripes]
+            for stripe in self._stripes:
+                stripe.items = []
+        finally:
+            for stripe in self._stripes:
+                stripe.lock.release()
+        return [item for _, item in heapq.merge(*batches)]
+
+    def __len__(self):
+        return sum(len(stripe.items) for stripe in self._stripes)
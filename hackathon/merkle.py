@@ -0,0 +1,108 @@
+# merkle.py - Merkle roots and inclusion proofs over block transactions
+
+import hashlib
+import json
+from json.encoder import encode_basestring_ascii as _json_str
+from math import isfinite
+
+# Same output as json.dumps(obj, sort_keys=True), without building an encoder per call
+_canonical_json = json.JSONEncoder(sort_keys=True).encode
+
+_TX_KEYS = {'crop', 'farmer', 'location', 'price', 'quantity', 'timestamp'}
+_TX_FIELDS = ('farmer', 'crop', 'price', 'quantity', 'location', 'timestamp')
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _tx_json(tx):
+    """json.dumps(tx, sort_keys=True) for a plain ledger transaction, or None if tx is not one"""
+    if tx.keys() != _TX_KEYS:
+        return None
+    crop, farmer, location = tx['crop'], tx['farmer'], tx['location']
+    price, quantity, timestamp = tx['price'], tx['quantity'], tx['timestamp']
+    if not (type(crop) is type(farmer) is type(location) is str
+            and type(price) is type(quantity) is type(timestamp) is float
+            and isfinite(price) and isfinite(quantity) and isfinite(timestamp)):
+        return None
+    return (f'{{"crop": {_json_str(crop)}, "farmer": {_json_str(farmer)}, '
+            f'"location": {_json_str(location)}, "price": {price!r}, '
+            f'"quantity": {quantity!r}, "timestamp": {timestamp!r}}}')
+
+
+def tx_hash(transaction):
+    """SHA-256 of a transaction's canonical JSON"""
+    encoded = _tx_json(transaction) or _canonical_json(transaction)
+    return sha256_hex(encoded.encode())
+
+
+def tx_hashes(rows):
+    """tx_hash() of many (farmer, crop, price, quantity, location, timestamp) rows in one pass.
+
+    Farmer/crop/location values repeat across a batch, so each is JSON-quoted once.
+    """
+    quoted = {}
+    hashes = []
+    for row in rows:
+        farmer, crop, price, quantity, location, timestamp = row
+        if not (type(crop) is type(farmer) is type(location) is str
+                and type(price) is type(quantity) is type(timestamp) is float
+                and isfinite(price) and isfinite(quantity) and isfinite(timestamp)):
+            hashes.append(tx_hash(dict(zip(_TX_FIELDS, row))))
+            continue
+        for text in (farmer, crop, location):
+            if text not in quoted:
+                quoted[text] = _json_str(text)
+        hashes.append(sha256_hex(
+            f'{{"crop": {quoted[crop]}, "farmer": {quoted[farmer]}, '
+            f'"location": {quoted[location]}, "price": {price!r}, '
+            f'"quantity": {quantity!r}, "timestamp": {timestamp!r}}}'.encode()))
+    return hashes
+
+
+def _parent(left, right):
+    return sha256_hex((left + right).encode())
+
+
+def _next_level(level):
+    parents = [_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        # Carried up as is: pairing it with a copy of itself would give
+        # [a, b, c] and [a, b, c, c] the same root
+        parents.append(level[-1])
+    return parents
+
+
+def merkle_root(hashes):
+    """Root over a list of hex leaf hashes; an odd node is carried up unchanged"""
+    if not hashes:
+        return sha256_hex(b'')
+    level = list(hashes)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_path(hashes, index):
+    """Sibling hashes from leaf `index` up to the root, as (hash, side) pairs"""
+    path = []
+    level = list(hashes)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append({'hash': level[sibling], 'side': 'left' if sibling < index else 'right'})
+        level = _next_level(level)
+        index //= 2
+    return path
+
+
+def verify_path(leaf, path, root):
+    """Check that `leaf` hashes up to `root` along `path`"""
+    node = leaf
+    for step in path:
+        if step['side'] == 'left':
+            node = _parent(step['hash'], node)
+        else:
+            node = _parent(node, step['hash'])
+    return node == root
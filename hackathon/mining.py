@@ -0,0 +1,74 @@
+# mining.py - Proof-of-work search split across a process pool
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_DIFFICULTY = 4
+
+
+def meets_difficulty(digest, difficulty):
+    """True if a raw SHA-256 digest starts with `difficulty` zero hex digits"""
+    zero_bytes, odd = divmod(difficulty, 2)
+    if digest[:zero_bytes] != bytes(zero_bytes):
+        return False
+    return not odd or digest[zero_bytes] < 0x10
+
+
+def valid_proof(last_proof, proof, difficulty=DEFAULT_DIFFICULTY):
+    """Validate a single proof"""
+    digest = hashlib.sha256(f'{last_proof}{proof}'.encode()).digest()
+    return meets_difficulty(digest, difficulty)
+
+
+def search(last_proof, start, stop, difficulty=DEFAULT_DIFFICULTY):
+    """Return the smallest valid proof in [start, stop), or None"""
+    # Hash the constant prefix once and only feed the nonce per attempt
+    prefix = hashlib.sha256(str(last_proof).encode())
+    zero_bytes, odd = divmod(difficulty, 2)
+    zeros = bytes(zero_bytes)
+    for proof in range(start, stop):
+        h = prefix.copy()
+        h.update(b'%d' % proof)
+        digest = h.digest()
+        if digest[:zero_bytes] == zeros and (not odd or digest[zero_bytes] < 0x10):
+            return proof
+    return None
+
+
+class Miner:
+    def __init__(self, difficulty=DEFAULT_DIFFICULTY, workers=None, chunk_size=20000):
+        self.difficulty = difficulty
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def proof_of_work(self, last_proof):
+        """Find the smallest proof for last_proof, one nonce chunk per worker per round"""
+        start = 0
+        while True:
+            stop = start + self.workers * self.chunk_size
+            if self.workers == 1:
+                results = [search(last_proof, start, stop, self.difficulty)]
+            else:
+                futures = [
+                    self._executor().submit(search, last_proof, lo,
+                                            lo + self.chunk_size, self.difficulty)
+                    for lo in range(start, stop, self.chunk_size)
+                ]
+                results = [f.result() for f in futures]
+            # Chunks are in nonce order, so the first hit is the smallest proof
+            for proof in results:
+                if proof is not None:
+                    return proof
+            start = stop
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,148 @@
+# prefetch.py - Background refresh of forecasts for recently seen grid cells
+#
+# Every successful forecast lookup registers its grid cell. A daemon thread
+# wakes every `interval` seconds (+/- jitter, so workers started together
+# drift apart), picks the registered cells whose cache entry expires within
+# `lead` seconds, and refreshes them in multi-location batches on a small
+# pool. A batch the upstream rejects is split until the offending cell is
+# found and forgotten. Cells nobody asked about for `idle_after` seconds, or
+# that the cache has already evicted, are forgotten too. Farms that keep
+# checking the weather are then served from the cache on the request path
+# instead of waiting on the upstream API.
+
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+
+
+class ForecastPrefetcher:
+    def __init__(self, refresh, cache, interval=60, lead=180, idle_after=26 * 3600,
+                 batch_size=50, concurrency=2, jitter=0.2, max_cells=None,
+                 rejected=lambda error: isinstance(error, ValueError)):
+        """refresh(cells) fetches and caches forecasts for a batch of cells;
+        cache.expires_in(cell) says how long the cached copy has left.
+        rejected(error) tells a refusal of the batch's contents apart from an
+        outage. The registry never outgrows the cache (max_entries)."""
+        self.refresh = refresh
+        self.cache = cache
+        self.interval = interval
+        self.lead = lead
+        self.idle_after = idle_after
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.max_cells = max_cells or cache.max_entries
+        self.rejected = rejected
+        self._seen = OrderedDict()  # cell -> last request time, oldest first
+        self._lock = threading.Lock()
+        self._thread = None
+        self.runs = 0
+        self.refreshed = 0
+        self.failed_batches = 0
+        self.rejected_cells = 0
+        self.dropped = 0
+
+    def touch(self, cell):
+        """Record a successful request for cell"""
+        with self._lock:
+            self._seen[cell] = monotonic()
+            self._seen.move_to_end(cell)
+            if len(self._seen) > self.max_cells:
+                self._seen.popitem(last=False)
+                self.dropped += 1
+
+    def due(self):
+        """Registered cells whose cached forecast is about to expire"""
+        now = monotonic()
+        with self._lock:
+            while self._seen:
+                cell, seen_at = next(iter(self._seen.items()))
+                if now - seen_at <= self.idle_after:
+                    break
+                del self._seen[cell]
+                self.dropped += 1
+            cells = list(self._seen)
+        due, evicted = [], []
+        for cell in cells:
+            remaining = self.cache.expires_in(cell)
+            if remaining is None:
+                # Evicted to make room: refetching it would only evict another
+                evicted.append(cell)
+            elif remaining < self.lead:
+                due.append(cell)
+        self.forget(evicted)
+        return due
+
+    def forget(self, cells):
+        with self._lock:
+            for cell in cells:
+                if self._seen.pop(cell, None) is not None:
+                    self.dropped += 1
+
+    def _refresh_batch(self, cells):
+        """Refresh cells; returns how many were refreshed"""
+        # Spread batches out instead of bursting them at the upstream API
+        sleep(random.uniform(0, self.jitter * self.interval / 2))
+        return self._refresh_split(cells)
+
+    def _refresh_split(self, cells):
+        # One bad coordinate fails the whole multi-location query: bisect to it
+        try:
+            self.refresh(cells)
+            return len(cells)
+        except Exception as e:
+            if not self.rejected(e):
+                raise
+        if len(cells) == 1:
+            self.forget(cells)
+            self.rejected_cells += 1
+            return 0
+        middle = len(cells) // 2
+        return self._refresh_split(cells[:middle]) + self._refresh_split(cells[middle:])
+
+    def run_once(self):
+        """Refresh every due cell; returns how many were refreshed"""
+        cells = self.due()
+        batches = [cells[i:i + self.batch_size] for i in range(0, len(cells), self.batch_size)]
+        refreshed = 0
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.concurrency,
+                                    thread_name_prefix='forecast-prefetch') as pool:
+                for future in [pool.submit(self._refresh_batch, b) for b in batches]:
+                    try:
+                        refreshed += future.result()
+                    except Exception:
+                        self.failed_batches += 1
+        self.runs += 1
+        self.refreshed += refreshed
+        return refreshed
+
+    def _loop(self, log):
+        while True:
+            sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+            try:
+                self.run_once()
+            except Exception as e:
+                log('Forecast prefetch failed: %s', e)
+
+    def start(self, log=print):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, args=(log,), daemon=True,
+                                            name='forecast-prefetch')
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            cells = len(self._seen)
+        return {
+            'cells': cells,
+            'interval': self.interval,
+            'lead': self.lead,
+            'runs': self.runs,
+            'refreshed': self.refreshed,
+            'failed_batches': self.failed_batches,
+            'rejected_cells': self.rejected_cells,
+            'dropped': self.dropped
+        }
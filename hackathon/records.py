@@ -0,0 +1,102 @@
+# records.py - Compact __slots__ records for ledger blocks and transactions
+#
+# A transaction dict costs ~6 key slots plus a hash table per record; these
+# records keep only the values, and intern the farmer/crop/location strings
+# that repeat across millions of rows. to_dict() rebuilds exactly the dicts
+# the ledger has always hashed, so digests are unchanged.
+
+import sys
+
+from merkle import tx_hash
+
+
+# Values a text field accepts; anything else (lists, objects) is refused
+TEXT_TYPES = (str, int, float)
+
+
+def text_type_error(field, value):
+    return f'{field} must be text, not {type(value).__name__}'
+
+
+def _text(field, value):
+    """Text columns hand back strings, so numbers are hashed as the string SQLite stores"""
+    if value is None:
+        return None
+    if isinstance(value, TEXT_TYPES):
+        return sys.intern(str(value))
+    raise TypeError(text_type_error(field, value))
+
+
+class Transaction:
+    FIELDS = ('farmer', 'crop', 'price', 'quantity', 'location', 'timestamp')
+    __slots__ = FIELDS
+
+    def __init__(self, farmer, crop, price, quantity, location, timestamp):
+        self.farmer = _text('farmer', farmer)
+        self.crop = _text('crop', crop)
+        self.price = float(price)
+        self.quantity = float(quantity)
+        self.location = _text('location', location)
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*(data[f] for f in cls.FIELDS))
+
+    def astuple(self):
+        """Values in FIELDS order (the ledger store's column order)"""
+        return (self.farmer, self.crop, self.price, self.quantity, self.location, self.timestamp)
+
+    def to_dict(self):
+        return dict(zip(self.FIELDS, self.astuple()))
+
+    def hash(self):
+        """Leaf hash; identical to tx_hash() of the equivalent dict"""
+        return tx_hash(self.to_dict())
+
+    def __eq__(self, other):
+        return isinstance(other, Transaction) and self.astuple() == other.astuple()
+
+    def __repr__(self):
+        return f'Transaction({self.farmer!r}, {self.crop!r}, {self.price}, {self.quantity}, {self.location!r})'
+
+
+class Block:
+    __slots__ = ('index', 'timestamp', 'merkle_root', 'proof', 'previous_hash', 'transactions')
+
+    def __init__(self, index, timestamp, merkle_root, proof, previous_hash, transactions=()):
+        self.index = index
+        self.timestamp = timestamp
+        self.merkle_root = merkle_root
+        self.proof = proof
+        self.previous_hash = previous_hash
+        self.transactions = tuple(transactions)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['index'], data['timestamp'], data['merkle_root'], data['proof'],
+                   data['previous_hash'], [Transaction.from_dict(t) for t in data['transactions']])
+
+    def header(self):
+        """The fields covered by the block hash"""
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'merkle_root': self.merkle_root,
+            'proof': self.proof,
+            'previous_hash': self.previous_hash,
+        }
+
+    def to_dict(self):
+        """The block in the ledger's JSON shape"""
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'transactions': [t.to_dict() for t in self.transactions],
+            'merkle_root': self.merkle_root,
+            'proof': self.proof,
+            'previous_hash': self.previous_hash,
+        }
+
+    def __repr__(self):
+        return f'Block({self.index}, {len(self.transactions)} transactions)'
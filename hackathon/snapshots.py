@@ -0,0 +1,79 @@
+# snapshots.py - Pre-serialised responses for endpoints backed by static data
+#
+# Payloads that only depend on CROP_DATABASE and other literals are encoded
+# once at startup into bytes, a gzip copy (when it pays off) and a strong
+# ETag. Serving one is a header check and a bytes copy: repeat requests with
+# a matching If-None-Match get an empty 304, and clients that accept gzip get
+# the pre-compressed body without the server compressing anything.
+
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+# Bodies smaller than this go out uncompressed (gzip framing would eat the gain)
+MIN_GZIP_BYTES = 512
+
+
+def encode(payload):
+    """JSON bytes exactly as jsonify() writes them outside debug mode"""
+    return (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class Snapshot:
+    """One immutable JSON response: body, gzip variant and ETag"""
+
+    def __init__(self, body, max_age=3600):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = f'public, max-age={max_age}'
+        self.gzipped = None
+        if len(body) >= MIN_GZIP_BYTES:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzipped = compressed
+
+    def response(self, request):
+        """304, gzip or identity response for request"""
+        # Each encoding is its own representation, so it gets its own strong ETag
+        gzip_etag = f'{self.etag}-gz'
+        if request.if_none_match.contains(self.etag) or request.if_none_match.contains(gzip_etag):
+            response = Response(status=304)
+            etag = gzip_etag if request.if_none_match.contains(gzip_etag) else self.etag
+        elif self.gzipped is not None and request.accept_encodings['gzip']:
+            response = Response(self.gzipped, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+            etag = gzip_etag
+        else:
+            response = Response(self.body, mimetype='application/json')
+            etag = self.etag
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control
+        if self.gzipped is not None:
+            response.vary.add('Accept-Encoding')
+        return response
+
+
+class SnapshotSet:
+    """Snapshots of one endpoint keyed by its (normalised) arguments"""
+
+    def __init__(self, max_age=3600):
+        self.max_age = max_age
+        self._snapshots = {}
+
+    def add(self, key, payload):
+        self._snapshots[key] = Snapshot(encode(payload), self.max_age)
+
+    def get(self, key):
+        return self._snapshots.get(key)
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def stats(self):
+        return {
+            'snapshots': len(self._snapshots),
+            'bytes': sum(len(s.body) for s in self._snapshots.values()),
+            'gzip_bytes': sum(len(s.gzipped or s.body) for s in self._snapshots.values())
+        }
@@ -0,0 +1,124 @@
+# soil_image.py - Colour features of soil photos and a soil-class estimate
+#
+# Photos are decoded downscaled (JPEG draft mode decodes at 1/2..1/8 scale
+# directly), so a 12 MP phone picture costs a few hundred KB and a few ms.
+# Pixels are converted to CIE L*a*b*, foliage, glare and deep shadow are
+# masked out, and each remaining pixel votes for the nearest soil colour
+# prototype. Munsell-like hue/value/chroma are derived from the median colour.
+
+import io
+
+import numpy as np
+from PIL import Image
+
+THUMBNAIL_SIZE = 256
+MAX_PIXELS = 64_000_000        # reject before decoding anything larger
+MIN_SOIL_FRACTION = 0.05
+
+# Typical Indian soil colours in L*a*b* with the pH they usually carry
+SOIL_CLASSES = {
+    'black': {'name': 'Black (Regur) soil', 'lab': (30, 2, 6), 'ph': 7.8},
+    'forest': {'name': 'Dark brown forest soil', 'lab': (33, 8, 16), 'ph': 5.8},
+    'red': {'name': 'Red soil', 'lab': (44, 22, 24), 'ph': 6.2},
+    'laterite': {'name': 'Laterite soil', 'lab': (50, 20, 34), 'ph': 5.3},
+    'alluvial': {'name': 'Alluvial soil', 'lab': (56, 6, 20), 'ph': 7.2},
+    'arid': {'name': 'Arid (desert) soil', 'lab': (70, 8, 26), 'ph': 8.2},
+}
+_CLASS_IDS = list(SOIL_CLASSES)
+_PROTOTYPES = np.array([c['lab'] for c in SOIL_CLASSES.values()], dtype=np.float32)
+
+# Lab hue angle (degrees) at the centre of each Munsell soil-chart hue page
+_MUNSELL_ANGLES = [25, 40, 48, 55, 65, 75, 85, 95]
+_MUNSELL_PAGES = ['5R', '10R', '2.5YR', '5YR', '7.5YR', '10YR', '2.5Y', '5Y']
+
+HUE_BINS = 12
+LIGHTNESS_BINS = 10
+
+_SRGB_TO_XYZ = np.array([[0.4124, 0.3576, 0.1805],
+                         [0.2126, 0.7152, 0.0722],
+                         [0.0193, 0.1192, 0.9505]], dtype=np.float32)
+_WHITE = np.array([0.9505, 1.0, 1.089], dtype=np.float32)
+
+# sRGB -> linear light for every 8-bit level
+_LINEAR = np.arange(256, dtype=np.float32) / 255
+_LINEAR = np.where(_LINEAR > 0.04045, ((_LINEAR + 0.055) / 1.055) ** 2.4, _LINEAR / 12.92).astype(np.float32)
+
+
+def load_thumbnail(source, size=THUMBNAIL_SIZE):
+    """Decode image bytes or a binary file to an RGB array no larger than size x size"""
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ValueError(f'Image too large ({width}x{height})')
+    # JPEG only: pick the smallest DCT scale that still covers `size`
+    image.draft('RGB', (size, size))
+    image = image.convert('RGB')
+    image.thumbnail((size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return np.asarray(image)
+
+
+def rgb_to_lab(rgb):
+    """(N, 3) uint8 sRGB -> (N, 3) float32 CIE L*a*b* (D65)"""
+    c = _LINEAR[rgb]
+    xyz = (c @ _SRGB_TO_XYZ.T) / _WHITE
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([116 * f[:, 1] - 16,
+                     500 * (f[:, 0] - f[:, 1]),
+                     200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def munsell(lab):
+    """Munsell-like notation (e.g. '7.5YR 4/3') for one L*a*b* colour"""
+    lightness, a, b = (float(v) for v in lab)
+    angle = np.degrees(np.arctan2(b, a))
+    page = int(np.abs(np.array(_MUNSELL_ANGLES) - angle).argmin())
+    value = int(np.clip(round(lightness / 10), 1, 9))
+    chroma = int(np.clip(round(np.hypot(a, b) / 6), 0, 8))
+    return f'{_MUNSELL_PAGES[page]} {value}/{chroma}'
+
+
+def soil_features(pixels):
+    """Histograms, median colour and class votes for an (H, W, 3) RGB array, or None if no soil is visible"""
+    lab = rgb_to_lab(pixels.reshape(-1, 3))
+    lightness, a = lab[:, 0], lab[:, 1]
+    # Drop foliage (green), glare and deep shadow
+    soil = (a > -4) & (lightness > 8) & (lightness < 92)
+    if soil.mean() < MIN_SOIL_FRACTION:
+        return None
+    lab = lab[soil]
+
+    # Nearest prototype: |x - p|^2 up to the per-pixel |x|^2 term
+    distances = (_PROTOTYPES ** 2).sum(axis=1) - 2 * lab @ _PROTOTYPES.T
+    votes = np.bincount(distances.argmin(axis=1), minlength=len(_CLASS_IDS)) / len(lab)
+
+    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360
+    hue_hist = np.histogram(hue, bins=HUE_BINS, range=(0, 360))[0] / len(lab)
+    lightness_hist = np.histogram(lab[:, 0], bins=LIGHTNESS_BINS, range=(0, 100))[0] / len(lab)
+    median = np.median(lab, axis=0)
+
+    return {
+        'lab': [round(float(v), 1) for v in median],
+        'munsell': munsell(median),
+        'soil_fraction': round(float(soil.mean()), 3),
+        'hue_histogram': [round(float(v), 3) for v in hue_hist],
+        'lightness_histogram': [round(float(v), 3) for v in lightness_hist],
+        'class_votes': {cid: round(float(v), 3) for cid, v in zip(_CLASS_IDS, votes)},
+    }
+
+
+def classify(features):
+    """(class id, share of soil pixels that voted for it)"""
+    votes = features['class_votes']
+    best = max(votes, key=votes.get)
+    return best, votes[best]
+
+
+def analyze(source, size=THUMBNAIL_SIZE):
+    """Features and soil class for an uploaded photo, or None if no soil is visible"""
+    features = soil_features(load_thumbnail(source, size))
+    if features is None:
+        return None
+    soil_class, confidence = classify(features)
+    return dict(features, soil_class=soil_class, confidence=confidence,
+                soil_type=SOIL_CLASSES[soil_class]['name'],
+                typical_ph=SOIL_CLASSES[soil_class]['ph'])
@@ -0,0 +1,232 @@
+# soil_tiles.py - Gridded topsoil pH store, memory-mapped from a .npy file
+#
+# Soil pH barely changes, so SoilGrids answers are kept on a regular lat/lon
+# grid (float32, NaN = not yet known). The grid is a plain .npy file opened
+# with mmap: startup is instant, pages load on demand, and every worker
+# mapping the same file sees cells filled in by the others. Locating a cell
+# is arithmetic on the grid origin and resolution, so a lookup is a couple
+# of array reads.
+#
+# Build one offline from SoilGrids or a CSV of samples:
+#   python soil_tiles.py build soil_ph.npy --csv samples.csv
+#   python soil_tiles.py build soil_ph.npy --fetch --bbox 8 13 76 80
+
+import argparse
+import csv
+import fcntl
+import json
+import os
+import threading
+from time import sleep
+
+import numpy as np
+
+# Default grid: mainland India at 0.05° (~5.5 km), 640 x 600 cells, 1.5 MB
+DEFAULT_BBOX = (6.0, 38.0, 68.0, 98.0)  # lat_min, lat_max, lon_min, lon_max
+DEFAULT_RESOLUTION = 0.05
+
+
+def soilgrids_url(lat, lon):
+    """SoilGrids REST query for mean topsoil (0-5 cm) pH"""
+    return f"https://rest.isric.org/soilgrids/v2.0/properties/query?lon={lon}&lat={lat}&property=phh2o&depth=0-5cm&value=mean"
+
+
+def soilgrids_ph(data):
+    """pH from a SoilGrids response (reported as pH x 10)"""
+    return data['properties'][0]['depths'][0]['values']['mean'] / 10
+
+
+class SoilTiles:
+    def __init__(self, path, bbox=DEFAULT_BBOX, resolution=DEFAULT_RESOLUTION):
+        self.path = path
+        self._meta_path = os.path.splitext(path)[0] + '.json'
+        self._lock = threading.Lock()
+        if not self._exists():
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Workers starting together: one creates the grid, the others wait
+            # and map it. Replacing a grid another worker had already mapped
+            # would leave that worker filling a deleted file.
+            with open(path + '.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not self._exists():
+                    self._create(bbox, resolution)
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        self.lat_min, self.lon_min = meta['lat_min'], meta['lon_min']
+        self.resolution = meta['resolution']
+        self.grid = np.load(path, mmap_mode='r+')
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+
+    def _exists(self):
+        return os.path.exists(self.path) and os.path.exists(self._meta_path)
+
+    def _create(self, bbox, resolution):
+        """Write an empty (all-NaN) grid (under the creation lock); the files are
+        swapped in whole, so a worker checking without the lock never maps a
+        half-written one"""
+        lat_min, lat_max, lon_min, lon_max = bbox
+        shape = (int(round((lat_max - lat_min) / resolution)) + 1,
+                 int(round((lon_max - lon_min) / resolution)) + 1)
+        suffix = f'.{os.getpid()}.tmp'
+        grid = np.lib.format.open_memmap(self.path + suffix, mode='w+', dtype=np.float32, shape=shape)
+        grid[:] = np.nan
+        grid.flush()
+        del grid
+        with open(self._meta_path + suffix, 'w') as f:
+            json.dump({'lat_min': lat_min, 'lon_min': lon_min,
+                       'resolution': resolution, 'shape': list(shape)}, f)
+        os.replace(self._meta_path + suffix, self._meta_path)
+        os.replace(self.path + suffix, self.path)
+
+    def _position(self, lat, lon):
+        """Fractional (row, col) of a point, or None outside the grid"""
+        row = (float(lat) - self.lat_min) / self.resolution
+        col = (float(lon) - self.lon_min) / self.resolution
+        rows, cols = self.grid.shape
+        if not (-0.5 <= row <= rows - 0.5 and -0.5 <= col <= cols - 0.5):
+            return None
+        return row, col
+
+    def cell(self, lat, lon):
+        """(row, col) of the nearest grid cell, or None outside the grid"""
+        position = self._position(lat, lon)
+        if position is None:
+            return None
+        rows, cols = self.grid.shape
+        return min(int(round(position[0])), rows - 1), min(int(round(position[1])), cols - 1)
+
+    def cell_center(self, cell):
+        return (round(self.lat_min + cell[0] * self.resolution, 6),
+                round(self.lon_min + cell[1] * self.resolution, 6))
+
+    def lookup(self, lat, lon, method='nearest'):
+        """pH at a point, or None if its nearest cell is not known yet.
+
+        'bilinear' blends the four surrounding cells, using whichever of them
+        are known.
+        """
+        position = self._position(lat, lon)
+        value = None if position is None else self.grid[self.cell(lat, lon)]
+        if value is None or np.isnan(value):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if method != 'bilinear':
+            return float(value)
+
+        row, col = position
+        rows, cols = self.grid.shape
+        r0 = min(max(int(np.floor(row)), 0), rows - 2)
+        c0 = min(max(int(np.floor(col)), 0), cols - 2)
+        fr = min(max(row - r0, 0.0), 1.0)
+        fc = min(max(col - c0, 0.0), 1.0)
+        (a, b), (c, d) = self.grid[r0:r0 + 2, c0:c0 + 2].tolist()
+        blended = total = 0.0
+        for corner, weight in ((a, (1 - fr) * (1 - fc)), (b, (1 - fr) * fc),
+                               (c, fr * (1 - fc)), (d, fr * fc)):
+            if corner == corner:  # not NaN
+                blended += corner * weight
+                total += weight
+        return blended / total if total > 0 else float(value)
+
+    def fill(self, lat, lon, ph):
+        """Record a fetched pH for the cell containing (lat, lon)"""
+        cell = self.cell(lat, lon)
+        if cell is None:
+            return False
+        with self._lock:
+            self.grid[cell] = ph
+            self.fills += 1
+        return True
+
+    def flush(self):
+        self.grid.flush()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'shape': list(self.grid.shape),
+            'resolution': self.resolution,
+            'known_cells': int(np.count_nonzero(~np.isnan(self.grid))),
+            'hits': self.hits,
+            'misses': self.misses,
+            'fills': self.fills,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+def load_samples(tiles, path):
+    """Average (lat, lon, ph) CSV samples into their cells; returns cells written"""
+    sums, counts = {}, {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                cell = tiles.cell(float(row['lat']), float(row['lon']))
+                ph = float(row['ph'])
+            except (KeyError, ValueError):
+                continue
+            if cell is not None:
+                sums[cell] = sums.get(cell, 0.0) + ph
+                counts[cell] = counts.get(cell, 0) + 1
+    for cell, total in sums.items():
+        tiles.grid[cell] = total / counts[cell]
+    tiles.flush()
+    return len(sums)
+
+
+def fetch_missing(tiles, fetch, bbox=None, delay=0.2):
+    """Fill every unknown cell in bbox with fetch(lat, lon); returns cells written"""
+    rows, cols = tiles.grid.shape
+    r0, c0, r1, c1 = 0, 0, rows - 1, cols - 1
+    if bbox:
+        lat_min, lat_max, lon_min, lon_max = bbox
+        r0, c0 = tiles.cell(lat_min, lon_min)
+        r1, c1 = tiles.cell(lat_max, lon_max)
+    written = 0
+    for row in range(r0, r1 + 1):
+        for col in np.flatnonzero(np.isnan(tiles.grid[row, c0:c1 + 1])) + c0:
+            lat, lon = tiles.cell_center((row, col))
+            try:
+                tiles.grid[row, col] = fetch(lat, lon)
+                written += 1
+            except Exception as e:
+                print(f'{lat},{lon}: {e}')
+            sleep(delay)
+        tiles.flush()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a SoilGrids pH tile store')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build')
+    build.add_argument('path')
+    build.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION)
+    build.add_argument('--grid', type=float, nargs=4, default=DEFAULT_BBOX,
+                       metavar=('LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX'))
+    build.add_argument('--csv', help='lat,lon,ph samples to load')
+    build.add_argument('--fetch', action='store_true', help='query SoilGrids for unknown cells')
+    build.add_argument('--bbox', type=float, nargs=4,
+                       metavar=('LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX'),
+                       help='limit --fetch to this box')
+    build.add_argument('--delay', type=float, default=0.2, help='seconds between SoilGrids queries')
+    args = parser.parse_args()
+
+    tiles = SoilTiles(args.path, tuple(args.grid), args.resolution)
+    if args.csv:
+        print(f'{load_samples(tiles, args.csv)} cells from {args.csv}')
+    if args.fetch:
+        from http_client import HTTPClient
+        client = HTTPClient()
+
+        def fetch(lat, lon):
+            return soilgrids_ph(client.get_json(soilgrids_url(lat, lon)))
+
+        print(f'{fetch_missing(tiles, fetch, args.bbox, args.delay)} cells from SoilGrids')
+    print(tiles.stats())
+
+
+if __name__ == '__main__':
+    main()
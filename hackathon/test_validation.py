@@ -0,0 +1,47 @@
+# test_validation.py - Chain audit checkpoints
+
+import sqlite3
+
+from blockchain import Blockchain
+from validation import validate_chain
+
+
+def _ledger(path, blocks=12):
+    blockchain = Blockchain(difficulty=1, path=str(path))
+    for i in range(blocks - 1):
+        blockchain.new_transaction(f'farmer {i}', 'rice', 20.0, 5.0, 'Madurai')
+        blockchain.mine()
+    return blockchain
+
+
+def test_failed_full_audit_is_not_hidden_by_an_older_checkpoint(tmp_path):
+    path = tmp_path / 'ledger.db'
+    blockchain = _ledger(path)
+    assert validate_chain(blockchain)['valid']  # checkpoint at the tip (block 12)
+
+    conn = sqlite3.connect(path)
+    conn.execute('UPDATE transactions SET price = 1 WHERE block_idx = 3')
+    conn.commit()
+    conn.close()
+
+    full = validate_chain(blockchain, full=True)
+    assert not full['valid'] and full['first_invalid']['index'] == 3
+
+    incremental = validate_chain(blockchain)
+    assert incremental['checked_from'] <= 3
+    assert not incremental['valid'] and incremental['first_invalid']['index'] == 3
+
+
+def test_tampered_genesis_clears_the_checkpoint(tmp_path):
+    path = tmp_path / 'ledger.db'
+    blockchain = _ledger(path, blocks=3)
+    assert validate_chain(blockchain)['valid']
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE blocks SET previous_hash = '2' WHERE idx = 1")
+    conn.commit()
+    conn.close()
+
+    assert not validate_chain(blockchain, full=True)['valid']
+    incremental = validate_chain(blockchain)
+    assert incremental['checked_from'] == 1 and not incremental['valid']
@@ -0,0 +1,56 @@
+# uploads.py - Bounded-memory handling of uploaded files
+#
+# Multipart file parts are spooled: held in memory up to SPOOL_BYTES, then
+# moved to a temporary file. Handlers hash and decode straight from that
+# stream instead of reading the upload into one bytes object.
+
+import hashlib
+import tracemalloc
+from contextlib import contextmanager
+from tempfile import SpooledTemporaryFile
+
+from flask import Request
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SpooledRequest(Request):
+    """Request whose file uploads spill to disk past SPOOL_BYTES"""
+    SPOOL_BYTES = 256 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return SpooledTemporaryFile(max_size=self.SPOOL_BYTES, mode='rb+')
+
+
+def file_digest(stream, chunk_size=CHUNK_SIZE):
+    """SHA-256 hex digest of a stream read in chunks; leaves it rewound"""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+@contextmanager
+def peak_memory():
+    """Track the peak of Python/NumPy allocations inside the block.
+
+    Yields a dict whose 'peak_bytes' is filled in on exit. tracemalloc is
+    process-wide and stays on once started (debug use only), so concurrent
+    requests inflate each other's figure; Pillow's own decode buffers are
+    not traced.
+    """
+    result = {}
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        yield result
+    finally:
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1] - base
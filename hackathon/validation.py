@@ -0,0 +1,124 @@
+# validation.py - Chain audit: hash links, proofs-of-work and Merkle roots, in parallel chunks
+
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from blockchain import Blockchain
+from ledger_store import TX_FIELDS, TX_COLUMNS
+from merkle import merkle_root, tx_hash
+from mining import valid_proof
+
+CHECKPOINT_KEY = 'validated_through'
+
+
+def _verify(query, start, stop, difficulty, check_transactions):
+    """Check blocks start..stop; return (index, reason) for the first bad one, or None.
+
+    Each proof is checked at the difficulty its block was sealed with;
+    `difficulty` only applies to blocks from before that was recorded.
+    """
+    rows = query('SELECT idx, timestamp, merkle_root, proof, previous_hash, hash, difficulty FROM blocks '
+                 'WHERE idx BETWEEN ? AND ? ORDER BY idx', (max(1, start - 1), stop))
+    previous = rows.pop(0) if rows and rows[0][0] == start - 1 else None
+
+    leaves = {}
+    seen = set()
+    if check_transactions:
+        for row in query(f'SELECT block_idx, hash, {TX_COLUMNS} FROM transactions '
+                         'WHERE block_idx BETWEEN ? AND ? ORDER BY block_idx, position',
+                         (start, stop)):
+            stored = row[1]
+            if tx_hash(dict(zip(TX_FIELDS, row[2:]))) != stored:
+                return row[0], 'transaction does not match its leaf hash'
+            if (row[0], stored) in seen:
+                return row[0], 'transaction appears twice in the block'
+            seen.add((row[0], stored))
+            leaves.setdefault(row[0], []).append(stored)
+
+    expected = start
+    for index, timestamp, root, proof, previous_hash, stored_hash, sealed_at in rows:
+        if index != expected:
+            return expected, 'block missing'
+        expected += 1
+
+        block = {'index': index, 'timestamp': timestamp, 'merkle_root': root,
+                 'proof': proof, 'previous_hash': previous_hash}
+        if Blockchain.hash(block) != stored_hash:
+            return index, 'header does not match its hash'
+        if check_transactions and merkle_root(leaves.get(index, [])) != root:
+            return index, 'merkle root does not match transactions'
+        if index > 1:
+            if previous is None or previous_hash != previous[5]:
+                return index, 'previous_hash does not link to the prior block'
+            if not valid_proof(previous[3], proof, difficulty if sealed_at is None else sealed_at):
+                return index, 'invalid proof of work'
+        previous = (index, timestamp, root, proof, previous_hash, stored_hash, sealed_at)
+
+    if expected <= stop:
+        return expected, 'block missing'
+    return None
+
+
+def verify_chunk(path, start, stop, difficulty, check_transactions=True):
+    """Process-pool entry point: verify a chunk over a read-only connection of its own"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return _verify(lambda sql, params: conn.execute(sql, params).fetchall(),
+                       start, stop, difficulty, check_transactions)
+    finally:
+        conn.close()
+
+
+def validate_chain(blockchain, full=False, workers=None, chunk_size=20000,
+                   check_transactions=True):
+    """Audit the ledger from the last verified checkpoint (or from genesis if full).
+
+    Returns a report with the range checked and the first tampered block, if any.
+    A successful run moves the checkpoint to the tip; a failed one moves it
+    back to the last block before the tampering (or clears it), so later
+    incremental runs keep reporting it.
+    """
+    store = blockchain.store
+    tip = store.tip()[0]
+    start = 1
+    checkpoint = None if full else store.get_meta(CHECKPOINT_KEY)
+    if checkpoint:
+        index, digest = json.loads(checkpoint)
+        # Re-check the checkpoint block itself so the new range links onto it
+        if index <= tip and store.block_hash(index) == digest:
+            start = index
+
+    chunks = [(lo, min(lo + chunk_size - 1, tip)) for lo in range(start, tip + 1, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if store.path == ':memory:' or workers == 1 or len(chunks) == 1:
+        failures = []
+        for lo, hi in chunks:
+            failure = _verify(store.query, lo, hi, blockchain.difficulty, check_transactions)
+            if failure:
+                failures.append(failure)
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = [pool.submit(verify_chunk, store.path, lo, hi,
+                                   blockchain.difficulty, check_transactions)
+                       for lo, hi in chunks]
+            failures = [f.result() for f in futures]
+
+    failures = [f for f in failures if f]
+    first = min(failures) if failures else None
+    # Every block before the first bad one has now been verified
+    verified = tip if first is None else first[0] - 1
+    if verified >= 1:
+        store.set_meta(CHECKPOINT_KEY, json.dumps([verified, store.block_hash(verified)]))
+    else:
+        store.delete_meta(CHECKPOINT_KEY)
+
+    return {
+        'valid': first is None,
+        'checked_from': start,
+        'checked_to': tip,
+        'first_invalid': {'index': first[0], 'reason': first[1]} if first else None
+    }